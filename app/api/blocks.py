@@ -1,63 +1,48 @@
 """板块/行业API路由"""
-import asyncio
-from datetime import datetime
-from concurrent.futures import ThreadPoolExecutor
+import logging
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request
 
-from ..connection.pool import tdx_connection_pool
 from ..connection.client import tdx_client
+from ..services.response_cache import cached, cached_response
 
 router = APIRouter(prefix="/api", tags=["blocks"])
-executor = ThreadPoolExecutor(max_workers=10)
+log = logging.getLogger("tdxmcp")
 
 
 @router.get("/blocks")
-async def get_stock_blocks():
+async def get_stock_blocks(request: Request):
     """获取股票板块数据"""
-    blocks = await asyncio.get_event_loop().run_in_executor(
-        executor, tdx_client.get_stock_blocks
-    )
-    
-    if blocks is None:
-        raise HTTPException(status_code=404, detail="板块数据获取失败")
-    
-    try:
-        print(f"板块数据条数: {len(blocks) if blocks else 0}")
-    except Exception:
-        pass
-    return {"blocks": blocks, "count": len(blocks) if blocks else 0}
+    async def _build():
+        blocks = await cached(
+            ("blocks",), tdx_client.get_stock_blocks
+        )
+        
+        if blocks is None:
+            raise HTTPException(status_code=404, detail="板块数据获取失败")
+        
+        n = len(blocks)
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug("板块数据条数: %d", n)
+        return {"blocks": blocks, "count": n}, n > 0
+
+    return await cached_response(("blocks",), _build, request)
 
 
 @router.get("/industries")
-async def get_industries():
+async def get_industries(request: Request):
     """获取行业信息数据"""
-    industries = await asyncio.get_event_loop().run_in_executor(
-        executor, tdx_client.get_industry_info
-    )
-    
-    if industries is None:
-        raise HTTPException(status_code=404, detail="行业数据获取失败")
-    
-    try:
-        print(f"行业数据条数: {len(industries) if industries else 0}")
-    except Exception:
-        pass
-    return {"industries": industries, "count": len(industries) if industries else 0}
-
-
-@router.get("/status")
-async def get_service_status():
-    """获取服务状态"""
-    return {
-        "connected": tdx_client.connected,
-        "current_server": tdx_client.current_server,
-        "connection_pool": {
-            "size": tdx_connection_pool._connection_pool.qsize(),
-            "max_size": tdx_connection_pool.max_connections,
-            "available": tdx_connection_pool._connection_pool.qsize(),
-            "in_use": 0
-        },
-        "timestamp": datetime.now().isoformat()
-    }
-
+    async def _build():
+        industries = await cached(
+            ("industries",), tdx_client.get_industry_info
+        )
+        
+        if industries is None:
+            raise HTTPException(status_code=404, detail="行业数据获取失败")
+        
+        n = len(industries)
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug("行业数据条数: %d", n)
+        return {"industries": industries, "count": n}, n > 0
+
+    return await cached_response(("industries",), _build, request)
@@ -1,18 +1,25 @@
 """历史数据API路由"""
 import asyncio
-from concurrent.futures import ThreadPoolExecutor
+from typing import List
 
-from fastapi import APIRouter, HTTPException
+import orjson
+from pydantic import ValidationError
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import StreamingResponse
 
 from ..models.schemas import BatchHistoryRequest
-from ..connection.client import tdx_client
+from ..connection.client import tdx_client, _split_batches
+from ..services.executor import run_blocking
+from ..services.response_cache import cached, cached_many, cached_response
+from .quotes import check_symbols
 
 router = APIRouter(prefix="/api", tags=["history"])
-executor = ThreadPoolExecutor(max_workers=10)
 
 
 @router.get("/history/{symbol}")
 async def get_history_data(
+    request: Request,
     symbol: str, 
     period: int = 9,  # 9: 日线, 0: 5分钟, 1: 15分钟等
     count: int = 100
@@ -21,28 +28,122 @@ async def get_history_data(
     if count > 1000:
         raise HTTPException(status_code=400, detail="一次最多获取1000条数据")
     
-    bars = await asyncio.get_event_loop().run_in_executor(
-        executor, tdx_client.get_security_bars, symbol, period, count
-    )
-    
-    if bars is None:
-        raise HTTPException(status_code=404, detail="历史数据获取失败")
-    
-    return {"symbol": symbol, "period": period, "data": bars}
+    async def _build():
+        bars = await cached(
+            ("bars", symbol.lower(), period, count), tdx_client.get_security_bars, symbol, period, count
+        )
+        
+        if bars is None:
+            raise HTTPException(status_code=404, detail="历史数据获取失败")
+        
+        return {"symbol": symbol, "period": period, "data": bars}, bool(bars)
+
+    return await cached_response(("bars", symbol, period, count), _build, request)
+
+
+# 流式批量K线同时在途的批次数，其余批次等前面的完成后再提交，避免一次占满线程池在途上限
+_STREAM_WINDOW = 4
+
+
+async def _stream_batch_bars(request: BatchHistoryRequest, invalid: List[str] = ()):
+    """
+    按批并发拉取K线，每批完成后逐只输出一行 NDJSON
+
+    同时最多 _STREAM_WINDOW 个批次在途；批次获取失败时该批每只股票输出带 error 字段的行，
+    与获取成功但没有数据的空列表区分开；格式错误的代码最先各输出一行 error
+    """
+    for symbol in invalid:
+        yield orjson.dumps({"symbol": symbol, "period": request.period, "data": [], "error": "股票代码格式错误"}) + b"\n"
+    chunks = iter(_split_batches(request.symbols, request.batch_size))
+    chunk_of = {}
 
+    def _submit():
+        chunk = next(chunks, None)
+        if chunk is not None:
+            task = asyncio.ensure_future(run_blocking(
+                tdx_client.get_batch_security_bars, chunk, request.period, request.count, len(chunk)
+            ))
+            chunk_of[task] = chunk
 
-@router.post("/history/batch")
-async def get_batch_history_data(request: BatchHistoryRequest):
-    """批量获取历史K线数据"""
+    try:
+        for _ in range(_STREAM_WINDOW):
+            _submit()
+        while chunk_of:
+            done, _ = await asyncio.wait(chunk_of, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                chunk = chunk_of.pop(task)
+                _submit()
+                error = None
+                try:
+                    bars = task.result()
+                    if bars is None:
+                        error = "历史数据获取失败"
+                except Exception as e:
+                    print(f"批量K线分批获取失败: {e}")
+                    bars, error = None, str(e) or type(e).__name__
+                for symbol in chunk:
+                    row = {"symbol": symbol, "period": request.period}
+                    if error is None:
+                        row["data"] = bars.get(symbol, [])
+                    else:
+                        row["data"] = []
+                        row["error"] = error
+                    yield orjson.dumps(row) + b"\n"
+    finally:
+        # 客户端提前断开时取消尚未完成的批次
+        for task in chunk_of:
+            task.cancel()
+
+
+# 请求体直接交给 pydantic-core 解析校验，跳过标准库 json.loads 和中间 dict；
+# 文档中的请求体结构通过 openapi_extra 保留
+_BATCH_HISTORY_BODY = {
+    "requestBody": {
+        "required": True,
+        "content": {"application/json": {"schema": BatchHistoryRequest.model_json_schema()}},
+    }
+}
+
+
+@router.post("/history/batch", openapi_extra=_BATCH_HISTORY_BODY)
+async def get_batch_history_data(http_request: Request, stream: bool = False):
+    """
+    批量获取历史K线数据
+
+    stream=true 时以 NDJSON 流式返回，每行一只股票，先完成的批次先输出
+    """
+    try:
+        request = BatchHistoryRequest.model_validate_json(await http_request.body())
+    except ValidationError as e:
+        raise RequestValidationError([{**err, "loc": ("body", *err["loc"])} for err in e.errors(include_url=False)])
     if len(request.symbols) > 100:
         raise HTTPException(status_code=400, detail="一次最多查询100只股票")
     
     if request.count > 1000:
         raise HTTPException(status_code=400, detail="一次最多获取1000条数据")
     
-    bars = await asyncio.get_event_loop().run_in_executor(
-        executor, tdx_client.get_batch_security_bars, request.symbols, request.period, request.count, request.batch_size
-    )
-    
-    return {"symbols": request.symbols, "period": request.period, "data": bars}
+    request.symbols, invalid = check_symbols(request.symbols)
+    if stream:
+        # GZip 中间件会缓冲压缩流，标记 identity 使其直接透传，每行完成即发送
+        return StreamingResponse(
+            _stream_batch_bars(request, invalid), media_type="application/x-ndjson",
+            headers={"Content-Encoding": "identity"}
+        )
+
+    async def _build():
+        # 与单只K线接口共用 ("bars", 代码, 周期, 条数) 缓存，只请求未命中的代码
+        bars = await cached_many(
+            request.symbols, lambda s: ("bars", s.lower(), request.period, request.count),
+            tdx_client.get_batch_security_bars, request.period, request.count, request.batch_size
+        )
+        # 获取失败的代码在 data 中仍为空列表，保持响应结构不变，并在 errors 中列出；有失败时不缓存响应
+        errors = [s for s in request.symbols if s not in bars]
+        bars = {s: bars.get(s, []) for s in request.symbols}
+        payload = {"symbols": request.symbols, "period": request.period, "data": bars,
+                   "errors": errors, "invalid": invalid}
+        return payload, any(bars.values()) and not errors
+
+    # 响应体包含 invalid，无效代码不同的请求不能共用同一缓存响应
+    key = ("bars", "batch", tuple(s.lower() for s in request.symbols), request.period, request.count, tuple(invalid))
+    return await cached_response(key, _build)
 
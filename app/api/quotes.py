@@ -1,55 +1,74 @@
 """行情API路由"""
-import asyncio
-from typing import List
-from concurrent.futures import ThreadPoolExecutor
+from typing import List, Tuple
 
-from fastapi import APIRouter, HTTPException
+import orjson
+from fastapi import APIRouter, HTTPException, Request, Response
+from fastapi.responses import ORJSONResponse
 
-from ..connection.client import tdx_client
+from ..connection import async_client
+from ..connection.client import tdx_client, normalize_symbols
+from ..services.executor import run_blocking
+from ..services.response_cache import cached, cached_many, cached_response, quote_key, single_flight
 
+# 行情类接口直接返回 ORJSONResponse：返回普通 dict 时 FastAPI 会先用 jsonable_encoder
+# 逐字段递归转换一遍再序列化，批量行情上百条记录时这一步比序列化本身还慢
 router = APIRouter(prefix="/api", tags=["quotes"])
-executor = ThreadPoolExecutor(max_workers=10)
+
+
+def check_symbols(symbols: List[str]) -> Tuple[List[str], List[str]]:
+    """
+    去重并校验代码格式，返回 (有效代码, 无效代码)；无效代码由调用方放入响应的 invalid 字段
+
+    无效代码占请求的一半及以上时视为请求本身有误，直接返回400，不再请求上游
+    """
+    valid, invalid = normalize_symbols(symbols)
+    if invalid and len(invalid) * 2 >= len(symbols):
+        raise HTTPException(status_code=400, detail=f"股票代码格式错误: {', '.join(invalid[:10])}")
+    return valid, invalid
+
+
+# 市场列表是静态数据，启动时序列化一次
+_MARKETS_JSON = orjson.dumps({"markets": tdx_client.get_market_list()})
 
 
 @router.get("/markets")
 async def get_markets():
     """获取市场列表"""
-    markets = await asyncio.get_event_loop().run_in_executor(
-        executor, tdx_client.get_market_list
-    )
-    return {"markets": markets}
+    return Response(_MARKETS_JSON, media_type="application/json")
 
 
 @router.get("/stock/{symbol}")
 async def get_stock_info(symbol: str):
     """获取股票基本信息"""
-    info = await asyncio.get_event_loop().run_in_executor(
-        executor, tdx_client.get_instrument_info, symbol
+    info = await run_blocking(
+        tdx_client.get_instrument_info, symbol
     )
     
     if info is None:
         raise HTTPException(status_code=404, detail="股票信息获取失败")
     
-    return {"symbol": symbol, "info": info}
+    return ORJSONResponse({"symbol": symbol, "info": info})
 
 
 @router.get("/quote/{symbol}")
-async def get_real_time_quote(symbol: str):
+async def get_real_time_quote(request: Request, symbol: str):
     """获取单个股票的实时行情"""
-    print(f"[DEBUG] 开始获取实时行情: {symbol}")
-    
-    quotes = await asyncio.get_event_loop().run_in_executor(
-        executor, tdx_client.get_security_quotes, [symbol]
-    )
-    
-    print(f"[DEBUG] 实时行情获取结果: symbol={symbol}, quotes={quotes}")
-    
-    if not quotes:
-        print(f"[ERROR] 实时行情获取失败: symbol={symbol}, quotes为空")
-        raise HTTPException(status_code=404, detail="实时行情获取失败")
-    
-    print(f"[DEBUG] 成功获取实时行情: symbol={symbol}, quote={quotes[0]}")
-    return {"symbol": symbol, "quote": quotes[0]}
+    async def _build():
+        print(f"[DEBUG] 开始获取实时行情: {symbol}")
+        
+        by_symbol = await cached_many([symbol], quote_key, async_client.get_security_quotes_by_symbol)
+        quotes = list(by_symbol.values())
+        
+        print(f"[DEBUG] 实时行情获取结果: symbol={symbol}, quotes={quotes}")
+        
+        if not quotes:
+            print(f"[ERROR] 实时行情获取失败: symbol={symbol}, quotes为空")
+            raise HTTPException(status_code=404, detail="实时行情获取失败")
+        
+        print(f"[DEBUG] 成功获取实时行情: symbol={symbol}, quote={quotes[0]}")
+        return {"symbol": symbol, "quote": quotes[0]}, True
+
+    return await cached_response(("quote", symbol), _build, request)
 
 
 @router.post("/quotes")
@@ -61,13 +80,14 @@ async def get_batch_quotes(symbols: List[str]):
         print(f"[ERROR] 批量查询股票数量超过限制: {len(symbols)} > 100")
         raise HTTPException(status_code=400, detail="一次最多查询100只股票")
     
-    quotes = await asyncio.get_event_loop().run_in_executor(
-        executor, tdx_client.get_security_quotes, symbols
-    )
+    symbols, invalid = check_symbols(symbols)
+    # 与单只行情接口共用 ("quote", 代码) 缓存，只请求未命中的代码
+    by_symbol = await cached_many(symbols, quote_key, async_client.get_security_quotes_by_symbol)
+    quotes = list(by_symbol.values())
     
     print(f"[DEBUG] 批量实时行情获取结果: symbols={symbols}, quotes_count={len(quotes) if quotes else 0}")
     
-    return {"quotes": quotes}
+    return ORJSONResponse({"quotes": quotes, "invalid": invalid})
 
 
 @router.post("/quotes/batch")
@@ -76,36 +96,38 @@ async def get_large_batch_quotes(symbols: List[str], batch_size: int = 80):
     if len(symbols) > 500:
         raise HTTPException(status_code=400, detail="一次最多查询500只股票")
     
-    quotes = await asyncio.get_event_loop().run_in_executor(
-        executor, tdx_client.get_batch_security_quotes, symbols, batch_size
-    )
+    symbols, invalid = check_symbols(symbols)
+    quotes = await async_client.get_batch_security_quotes(symbols, batch_size)
     
-    return {"quotes": quotes, "count": len(quotes) if quotes else 0}
+    n = len(quotes) if quotes else 0
+    return ORJSONResponse({"quotes": quotes, "count": n, "invalid": invalid})
 
 
 @router.get("/finance/{symbol}")
-async def get_finance_data(symbol: str):
+async def get_finance_data(request: Request, symbol: str):
     """获取财务信息"""
-    finance_info = await asyncio.get_event_loop().run_in_executor(
-        executor, tdx_client.get_finance_info, symbol
-    )
-    
-    if finance_info is None:
-        raise HTTPException(status_code=404, detail="财务信息获取失败")
-    
-    return {"symbol": symbol, "finance_info": finance_info}
+    async def _build():
+        finance_info = await cached(
+            ("finance", symbol.lower()), tdx_client.get_finance_info, symbol
+        )
+        
+        if finance_info is None:
+            raise HTTPException(status_code=404, detail="财务信息获取失败")
+        
+        return {"symbol": symbol, "finance_info": finance_info}, bool(finance_info)
+
+    return await cached_response(("finance", symbol), _build, request)
 
 
 @router.get("/report/{symbol}")
 async def get_company_report(symbol: str, report_type: int = 0):
     """获取公司报告文件"""
-    report_data = await asyncio.get_event_loop().run_in_executor(
-        executor, tdx_client.get_company_report, symbol, report_type
+    # 只需要大小信息，在工作线程中计算，不把报告内容传回事件循环
+    data_size, has_data = await single_flight(
+        ("report", symbol.lower(), report_type), tdx_client.get_company_report_meta, symbol, report_type
     )
     
     # 即使无法获取报告数据，也返回一个合理的响应而不是404
-    data_size = len(report_data) if report_data else 0
-    has_data = bool(report_data)
     
     return {
         "symbol": symbol, 
@@ -119,15 +141,15 @@ async def get_company_report(symbol: str, report_type: int = 0):
 @router.get("/xdxr/{symbol}")
 async def get_xdxr_info(symbol: str):
     """获取除权除息信息"""
-    xdxr_info = await asyncio.get_event_loop().run_in_executor(
-        executor, tdx_client.get_xdxr_info, symbol
+    xdxr_info = await cached(
+        ("xdxr", symbol.lower()), tdx_client.get_xdxr_info, symbol
     )
     
     if xdxr_info is None:
         raise HTTPException(status_code=404, detail="除权除息信息获取失败")
     
-    safe_info = tdx_client._json_safe_records(xdxr_info)
-    return {"symbol": symbol, "xdxr_info": safe_info, "count": len(safe_info) if safe_info else 0}
+    # 客户端返回的记录已经过 JSON 安全处理，这里不再重复转换
+    return ORJSONResponse({"symbol": symbol, "xdxr_info": xdxr_info, "count": len(xdxr_info)})
 
 
 @router.get("/news")
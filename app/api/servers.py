@@ -4,36 +4,84 @@ import json
 import socket
 import time
 import asyncio
-from concurrent.futures import ThreadPoolExecutor
 
-from fastapi import APIRouter, HTTPException
+import orjson
+from fastapi import APIRouter, HTTPException, Response
+from fastapi.responses import ORJSONResponse
 from pytdx.hq import TdxHq_API
 
 from config import TDX_SERVERS
 from ..models.schemas import ServerConfig, ServersPayload, SelectPayload, TestPayload
 from ..connection.pool import tdx_connection_pool
 from ..connection.client import tdx_client
+from ..services.executor import run_blocking, executor_stats
+from ..services.response_cache import response_cache
+from ..services import disk_cache
 
 router = APIRouter(prefix="/api", tags=["servers"])
-executor = ThreadPoolExecutor(max_workers=10)
+# 批量探测服务器时的最大并发数
+_probe_semaphore = asyncio.Semaphore(8)
 
 # 获取缓存目录路径
 def _get_cache_dir():
     return os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "cache")
 
+
+def _server_key(srv):
+    """服务器唯一标识 (ip, port)；条目不是字典、缺少ip或端口不是1-65535的整数时返回None"""
+    if not isinstance(srv, dict) or not srv.get("ip"):
+        return None
+    try:
+        port = int(srv.get("port"))
+    except (TypeError, ValueError):
+        return None
+    if not 0 < port < 65536:
+        return None
+    return srv["ip"], port
+
+
+def _dedupe_servers(servers):
+    """去除重复及无效的服务器条目，保留首次出现的顺序"""
+    seen = set()
+    rs = []
+    for srv in servers:
+        key = _server_key(srv)
+        if key is None or key in seen:
+            continue
+        seen.add(key)
+        rs.append(srv)
+    return rs
+
+# servers.json 解析结果: (mtime_ns, size, data)，文件未变化时不重复读取解析
+_servers_file_cache = (None, None, None)
+
+
+def _load_servers_file(servers_path: str):
+    """读取 servers.json，按修改时间和大小缓存解析结果；文件不存在或损坏时返回None"""
+    global _servers_file_cache
+    try:
+        st = os.stat(servers_path)
+    except OSError:
+        return None
+    mtime, size, data = _servers_file_cache
+    if mtime == st.st_mtime_ns and size == st.st_size:
+        return data
+    try:
+        with open(servers_path, "rb") as f:
+            data = orjson.loads(f.read())
+    except Exception:
+        data = None
+    _servers_file_cache = (st.st_mtime_ns, st.st_size, data)
+    return data
+
+
 @router.get("/servers")
 async def get_servers():
     """获取服务器列表"""
-    cache_dir = _get_cache_dir()
-    servers_path = os.path.join(cache_dir, "servers.json")
-    try:
-        if os.path.exists(servers_path):
-            with open(servers_path, "r", encoding="utf-8") as f:
-                data = json.load(f)
-                return {"servers": data.get("servers", TDX_SERVERS), "current": data.get("current", tdx_client.current_server)}
-    except Exception:
-        pass
-    return {"servers": TDX_SERVERS, "current": tdx_client.current_server}
+    data = _load_servers_file(os.path.join(_get_cache_dir(), "servers.json"))
+    if isinstance(data, dict):
+        return ORJSONResponse({"servers": data.get("servers", TDX_SERVERS), "current": data.get("current", tdx_client.current_server)})
+    return ORJSONResponse({"servers": TDX_SERVERS, "current": tdx_client.current_server})
 
 
 @router.post("/connect")
@@ -42,8 +90,8 @@ async def connect_server(server_index: int = 0):
     if server_index >= len(TDX_SERVERS):
         raise HTTPException(status_code=400, detail="服务器索引超出范围")
     
-    success = await asyncio.get_event_loop().run_in_executor(
-        executor, tdx_client.connect, TDX_SERVERS[server_index]
+    success = await run_blocking(
+        tdx_client.connect, TDX_SERVERS[server_index]
     )
     
     return {"success": success, "server": TDX_SERVERS[server_index] if success else None}
@@ -88,7 +136,7 @@ async def set_server_config(cfg: ServerConfig):
             pass
         return True
     
-    success = await asyncio.get_event_loop().run_in_executor(executor, _apply)
+    success = await run_blocking(_apply)
     return {"success": success, "server": server}
 
 
@@ -105,9 +153,13 @@ async def set_servers(payload: ServersPayload):
         raise HTTPException(status_code=400, detail="服务器列表为空")
     cache_dir = _get_cache_dir()
     servers_path = os.path.join(cache_dir, "servers.json")
+    invalid = [i for i, srv in enumerate(payload.servers) if _server_key(srv) is None]
+    if invalid:
+        raise HTTPException(status_code=422, detail=f"服务器条目无效(需要ip和1-65535的端口): 序号 {invalid}")
+    servers = _dedupe_servers(payload.servers)
     
     def _apply():
-        data = {"servers": payload.servers, "current": None}
+        data = {"servers": servers, "current": None}
         old_current = None
         try:
             if os.path.exists(servers_path):
@@ -124,13 +176,13 @@ async def set_servers(payload: ServersPayload):
             chosen = None
             try:
                 if isinstance(old_current, dict):
-                    for s in payload.servers:
+                    for s in servers:
                         if s.get("ip") == old_current.get("ip") and int(s.get("port")) == int(old_current.get("port")):
                             chosen = s
                             break
             except Exception:
                 chosen = None
-            data["current"] = chosen or payload.servers[0]
+            data["current"] = chosen or servers[0]
         try:
             os.makedirs(cache_dir, exist_ok=True)
             with open(servers_path, "w", encoding="utf-8") as f:
@@ -145,7 +197,7 @@ async def set_servers(payload: ServersPayload):
             pass
         return True
     
-    ok = await asyncio.get_event_loop().run_in_executor(executor, _apply)
+    ok = await run_blocking(_apply)
     return {"success": ok}
 
 
@@ -176,10 +228,40 @@ async def select_server(payload: SelectPayload):
         except Exception:
             return False
 
-    ok = await asyncio.get_event_loop().run_in_executor(executor, _apply)
+    ok = await run_blocking(_apply)
     return {"success": ok}
 
 
+def _probe_server(srv):
+    """探测单个服务器：先测TCP连通性，再测TDX握手"""
+    tcp_ok = False
+    tcp_err = None
+    t0 = time.time()
+    try:
+        with socket.create_connection((srv["ip"], int(srv["port"])), timeout=2):
+            tcp_ok = True
+    except Exception as e:
+        tcp_err = str(e)
+    tcp_ms = int((time.time() - t0) * 1000)
+    if not tcp_ok:
+        return {"success": False, "latency_ms": tcp_ms, "server": srv, "reason": "tcp_connect_failed", "error": tcp_err}
+    api = TdxHq_API()
+    t1 = time.time()
+    ok = False
+    tdx_err = None
+    try:
+        ok = api.connect(srv["ip"], int(srv["port"]))
+    except Exception as e:
+        tdx_err = str(e)
+        ok = False
+    try:
+        api.disconnect()
+    except Exception:
+        pass
+    ms = int((time.time() - t1) * 1000)
+    return {"success": bool(ok), "latency_ms": ms, "server": srv, "reason": "ok" if ok else "tdx_handshake_failed", "error": tdx_err}
+
+
 @router.post("/server/test")
 async def test_server(payload: TestPayload):
     """测试服务器连接"""
@@ -207,37 +289,47 @@ async def test_server(payload: TestPayload):
         srv = _resolve()
         if not srv:
             return {"success": False, "error": "未找到服务器"}
-        tcp_ok = False
-        tcp_err = None
-        t0 = time.time()
-        try:
-            with socket.create_connection((srv["ip"], int(srv["port"])), timeout=2):
-                tcp_ok = True
-        except Exception as e:
-            tcp_err = str(e)
-        tcp_ms = int((time.time() - t0) * 1000)
-        if not tcp_ok:
-            return {"success": False, "latency_ms": tcp_ms, "server": srv, "reason": "tcp_connect_failed", "error": tcp_err}
-        api = TdxHq_API()
-        t1 = time.time()
-        ok = False
-        tdx_err = None
-        try:
-            ok = api.connect(srv["ip"], int(srv["port"]))
-        except Exception as e:
-            tdx_err = str(e)
-            ok = False
-        try:
-            api.disconnect()
-        except Exception:
-            pass
-        ms = int((time.time() - t1) * 1000)
-        return {"success": bool(ok), "latency_ms": ms, "server": srv, "reason": "ok" if ok else "tdx_handshake_failed", "error": tdx_err}
+        return _probe_server(srv)
 
-    rs = await asyncio.get_event_loop().run_in_executor(executor, _test)
+    rs = await run_blocking(_test)
     return rs
 
 
+@router.post("/servers/test")
+async def test_servers():
+    """并发测试所有已保存的服务器，探测并发数受信号量限制"""
+    # 与 GET /api/servers 共用按修改时间缓存的解析结果，文件缺失、损坏或列表为空时使用默认服务器
+    data = _load_servers_file(os.path.join(_get_cache_dir(), "servers.json"))
+    servers = data.get("servers") if isinstance(data, dict) else None
+    if not (isinstance(servers, list) and servers):
+        servers = TDX_SERVERS
+
+    async def _probe(srv):
+        async with _probe_semaphore:
+            return await run_blocking(_probe_server, srv)
+
+    # 相同 ip:port 只探测一次，结果复用到所有重复条目
+    # 无效条目(缺少ip或端口非法)不探测，直接报告失败
+    unique = {}
+    for srv in servers:
+        key = _server_key(srv)
+        if key is not None:
+            unique.setdefault(key, srv)
+    keys = list(unique.keys())
+    rs = await asyncio.gather(*[_probe(unique[k]) for k in keys], return_exceptions=True)
+    probed = dict(zip(keys, rs))
+
+    results = []
+    for srv in servers:
+        r = probed.get(_server_key(srv))
+        if r is None:
+            r = {"success": False, "reason": "invalid_server"}
+        elif isinstance(r, Exception):
+            r = {"success": False, "reason": "probe_failed", "error": str(r)}
+        results.append({**r, "server": srv})
+    return {"results": results, "count": len(results), "probed": len(keys)}
+
+
 @router.get("/server/saved")
 async def get_saved_server():
     """获取已保存的服务器配置"""
@@ -252,18 +344,62 @@ async def get_saved_server():
     return {"saved": None}
 
 
+# 状态接口常被健康检查高频探测，序列化结果缓存1秒: (生成时间, 响应体)
+STATUS_CACHE_TTL = 1.0
+_status_cache = (0.0, b"")
+
+
 @router.get("/status")
 async def get_status():
     """获取服务状态和连接池详情"""
-    pool_status = tdx_connection_pool.get_status()
+    global _status_cache
+    now = time.monotonic()
+    if now - _status_cache[0] < STATUS_CACHE_TTL:
+        return Response(_status_cache[1], media_type="application/json")
 
-    return {
+    pool_status = tdx_connection_pool.get_status()
+    body = orjson.dumps({
         "connected": True,
         "current_server": pool_status.get("current_server"),
         "connection_pool": {
             "max_connections_per_server": pool_status.get("max_connections_per_server"),
             "retry_times": pool_status.get("retry_times"),
+            "idle": pool_status.get("idle", 0),
+            "in_use": pool_status.get("in_use", 0),
             "servers": pool_status.get("servers", [])
-        }
-    }
+        },
+        "executor": executor_stats(),
+        "response_cache": response_cache.stats()
+    })
+    _status_cache = (now, body)
+    return Response(body, media_type="application/json")
+
+
+def _clear_reference_files() -> int:
+    """删除板块/行业文件缓存，下次请求时重新下载构建"""
+    removed = 0
+    for name in ("blocks.json", "industries.json"):
+        try:
+            os.remove(os.path.join(_get_cache_dir(), name))
+            removed += 1
+        except OSError:
+            pass
+    return removed
+
+
+@router.post("/cache/clear")
+async def clear_response_cache(reference: bool = False):
+    """
+    清空接口响应缓存（内存与磁盘）
+
+    reference=true 时同时清空板块/行业数据缓存(内存与 blocks.json/industries.json)，下次请求重新构建
+    """
+    stats = response_cache.stats()
+    cleared = response_cache.clear()
+    disk_cleared = await run_blocking(disk_cache.clear)
+    if reference:
+        cleared += tdx_client.invalidate_reference_cache()
+        disk_cleared += await run_blocking(_clear_reference_files)
+    print(f"[缓存] 清空响应缓存: {cleared} 条, 磁盘 {disk_cleared} 个文件, 命中 {stats['hits']} 次, 未命中 {stats['misses']} 次")
+    return {"success": True, "cleared": cleared, "disk_cleared": disk_cleared, "hits": stats["hits"], "misses": stats["misses"]}
 
@@ -1,6 +1,15 @@
 """连接管理模块"""
-from .pool import TDXConnectionPool
-from .client import TDXClient
 
 __all__ = ["TDXConnectionPool", "TDXClient"]
 
+
+def __getattr__(name):
+    # 连接池与客户端在首次访问时才导入：导入 pool 会创建全局连接池并启动健康检查线程，
+    # 只用到 symbols 等无副作用模块的脚本不应触发
+    if name == "TDXConnectionPool":
+        from .pool import TDXConnectionPool
+        return TDXConnectionPool
+    if name == "TDXClient":
+        from .client import TDXClient
+        return TDXClient
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
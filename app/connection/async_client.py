@@ -0,0 +1,212 @@
+"""
+异步TDX行情客户端
+
+实时行情是调用最频繁的接口，协议也最简单：复用 pytdx 的请求包构造和响应解析，
+收发改为 asyncio 流，接口直接 await，不占用线程池。其余接口仍走线程池中的 pytdx。
+"""
+import asyncio
+import logging
+import struct
+import time
+import zlib
+from typing import Any, Dict, List, Optional, Tuple
+
+from pytdx.parser.get_security_quotes import GetSecurityQuotesCmd
+from pytdx.parser.setup_commands import SetupCmd1, SetupCmd2, SetupCmd3
+
+from config import API_CONFIG
+from ..services.executor import run_blocking
+from .client import tdx_client, _parse_symbol, _split_batches, _symbols_to_market_codes
+from .pool import tdx_connection_pool
+
+log = logging.getLogger("tdxmcp")
+
+# pytdx 响应头: 3个保留字段 + 压缩后长度 + 解压后长度
+_RSP_HEADER = struct.Struct("<IIIHH")
+# 连接、读取或解析失败时退回线程池实现；响应体被截断或格式不符时 pytdx 的解析
+# 会抛出 ValueError/IndexError/KeyError/TypeError 等，同样视为该连接失败
+_ASYNC_ERRORS = (
+    OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, zlib.error, struct.error,
+    ValueError, IndexError, KeyError, TypeError,
+)
+# 单个请求包最多携带的代码数，与 get_batch_security_quotes 的默认 batch_size 一致
+_QUOTES_PER_REQUEST = 80
+
+
+class AsyncTdxConnection:
+    """基于 asyncio 流的单个TDX连接，同一时刻只处理一个请求"""
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, timeout: float, ip: str = ""):
+        self.reader = reader
+        self.writer = writer
+        self.timeout = timeout
+        self.ip = ip
+        # 最近一次放回空闲队列的时间
+        self.last_used = time.monotonic()
+
+    @classmethod
+    async def open(cls, ip: str, port: int, timeout: float) -> "AsyncTdxConnection":
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(ip, port), timeout)
+        conn = cls(reader, writer, timeout, ip)
+        try:
+            # 与 TdxHq_API.connect 相同的三个握手包，响应内容不需要
+            for setup_cls in (SetupCmd1, SetupCmd2, SetupCmd3):
+                cmd = setup_cls(None)
+                cmd.setup()
+                await conn._request(cmd.send_pkg)
+        except BaseException:
+            conn.close()
+            raise
+        return conn
+
+    async def _request(self, pkg: bytes) -> bytes:
+        self.writer.write(pkg)
+        await self.writer.drain()
+        head = await asyncio.wait_for(self.reader.readexactly(_RSP_HEADER.size), self.timeout)
+        _, _, _, zipsize, unzipsize = _RSP_HEADER.unpack(head)
+        body = await asyncio.wait_for(self.reader.readexactly(zipsize), self.timeout)
+        return body if zipsize == unzipsize else zlib.decompress(body)
+
+    async def get_security_quotes(self, req: List[Tuple[int, str]]) -> List[Dict[str, Any]]:
+        cmd = GetSecurityQuotesCmd(None)
+        cmd.setParams(req)
+        body = await self._request(cmd.send_pkg)
+        return cmd.parseResponse(body)
+
+    def is_alive(self) -> bool:
+        """空闲连接检查：本端已关闭或已收到服务器的EOF都不能再用"""
+        return not self.writer.is_closing() and not self.reader.at_eof()
+
+    def close(self):
+        self.writer.close()
+
+
+class AsyncTdxPool:
+    """asyncio.Queue 管理的空闲连接，只在事件循环线程中使用"""
+
+    def __init__(self, max_connections: int, timeout: float):
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._idle: Optional[asyncio.Queue] = None
+        self._opened = 0
+
+    def _bind_loop(self):
+        """连接绑定在创建它的事件循环上，循环变化时(如测试中多次启动)丢弃旧连接"""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._idle = asyncio.Queue()
+            self._opened = 0
+
+    def _usable(self, conn: AsyncTdxConnection) -> bool:
+        """
+        借出前检查空闲连接：套接字仍然正常、所在服务器未被同步连接池标记为不可用，
+        且空闲时间不超过连接池的 idle_check_interval(TDX服务器会断开长时间空闲的连接)
+        """
+        return (conn.is_alive()
+                and tdx_connection_pool._is_server_available(conn.ip)
+                and time.monotonic() - conn.last_used <= tdx_connection_pool.idle_check_interval)
+
+    def _discard(self, conn: AsyncTdxConnection):
+        conn.close()
+        self._opened -= 1
+
+    async def _open(self) -> AsyncTdxConnection:
+        """按同步连接池的健康状态与负载均衡顺序选择服务器建连，并把结果记回同步连接池"""
+        error: Optional[BaseException] = None
+        for server in tdx_connection_pool.ordered_servers():
+            start = time.perf_counter()
+            try:
+                conn = await AsyncTdxConnection.open(server["ip"], server["port"], self.timeout)
+            except _ASYNC_ERRORS as e:
+                tdx_connection_pool._mark_server_failed(server["ip"])
+                error = e
+                continue
+            tdx_connection_pool._record_latency(server["ip"], (time.perf_counter() - start) * 1000)
+            tdx_connection_pool._mark_server_healthy(server["ip"])
+            return conn
+        raise error or OSError("没有可用的TDX服务器")
+
+    async def acquire(self) -> AsyncTdxConnection:
+        self._bind_loop()
+        while True:
+            while not self._idle.empty():
+                conn = self._idle.get_nowait()
+                if self._usable(conn):
+                    return conn
+                self._discard(conn)
+            if self._opened < self.max_connections:
+                self._opened += 1
+                try:
+                    return await self._open()
+                except BaseException:
+                    self._opened -= 1
+                    raise
+            conn = await asyncio.wait_for(self._idle.get(), self.timeout)
+            if self._usable(conn):
+                return conn
+            self._discard(conn)
+
+    def release(self, conn: AsyncTdxConnection, ok: bool):
+        """请求成功的连接放回队列；失败或被取消的连接状态未知，直接关闭"""
+        if ok:
+            conn.last_used = time.monotonic()
+            self._idle.put_nowait(conn)
+        else:
+            self._discard(conn)
+
+    async def get_security_quotes(self, req: List[Tuple[int, str]]) -> List[Dict[str, Any]]:
+        conn = await self.acquire()
+        ok = False
+        try:
+            data = await conn.get_security_quotes(req)
+            ok = True
+            return data
+        finally:
+            self.release(conn, ok)
+
+
+async_pool = AsyncTdxPool(
+    max_connections=tdx_connection_pool.max_connections,
+    timeout=tdx_connection_pool.connect_timeout,
+)
+
+
+async def _gather_quotes(symbols: List[str], batch_size: int) -> List[Dict[str, Any]]:
+    """按批并行请求，每批占用一个连接"""
+    batches = _split_batches(_symbols_to_market_codes(symbols), min(batch_size, _QUOTES_PER_REQUEST))
+    results = await asyncio.gather(*(async_pool.get_security_quotes(req) for req in batches))
+    return [q for data in results for q in tdx_client._json_safe_records(data or [])]
+
+
+async def get_security_quotes_by_symbol(symbols: List[str]) -> Optional[Dict[str, Dict[str, Any]]]:
+    """
+    异步获取实时行情，返回值与 TDXClient.get_security_quotes_by_symbol 相同
+
+    异步连接失败时退回线程池中的 pytdx 实现，后者带有服务器切换和重试
+    """
+    if API_CONFIG["async_quotes"]:
+        try:
+            quotes = await _gather_quotes(symbols, _QUOTES_PER_REQUEST)
+        except _ASYNC_ERRORS as e:
+            log.warning("[异步行情] 获取失败，改用线程池: %s", e)
+        else:
+            by_code = {(q.get("market"), q.get("code")): q for q in quotes}
+            result = {}
+            for s in symbols:
+                q = by_code.get(_parse_symbol(s))
+                if q is not None:
+                    result[s] = q
+            return result
+    return await run_blocking(tdx_client.get_security_quotes_by_symbol, symbols)
+
+
+async def get_batch_security_quotes(symbols: List[str], batch_size: int = 80) -> Optional[List[Dict[str, Any]]]:
+    """异步批量获取实时行情，返回值与 TDXClient.get_batch_security_quotes 相同"""
+    if API_CONFIG["async_quotes"]:
+        try:
+            return await _gather_quotes(symbols, batch_size)
+        except _ASYNC_ERRORS as e:
+            log.warning("[异步行情] 获取失败，改用线程池: %s", e)
+    return await run_blocking(tdx_client.get_batch_security_quotes, symbols, batch_size)
@@ -1,18 +1,155 @@
 """TDX客户端"""
 import os
+import re
 import json
+import math
 import shutil
 import tempfile
 import random
+import sys
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import Dict, Any, List, Optional
-from urllib.request import urlopen
+from functools import lru_cache
+from io import BytesIO, StringIO
+from typing import Dict, Any, List, Optional, Tuple
+from urllib.error import HTTPError, URLError
+from urllib.request import Request, urlopen
+from zipfile import ZipFile
 
 import pandas as pd
 import numpy as np
 from pytdx.hq import TdxHq_API
 
+from config import MARKET_CODES, RESPONSE_CACHE_TTL
 from .pool import tdx_connection_pool
+from .symbols import a_share_mask
+
+# 除权除息类别含义
+_XDXR_CAT_MAP = {
+    1: "除权除息",
+    2: "送股",
+    3: "配股",
+    4: "现金红利",
+    5: "股本变化",
+    6: "其他"
+}
+
+# 批量行情/K线分批并行使用的共享线程池。调用方本身运行在 services.executor 的线程中，
+# 不能再提交回那个线程池(会互相等待)，这里单独建一个，线程数与单服务器最大连接数一致
+_batch_executor = ThreadPoolExecutor(
+    max_workers=tdx_connection_pool.max_connections,
+    thread_name_prefix="tdx-batch"
+)
+
+# 下载通达信数据文件的单次超时(秒)与最多尝试次数
+_DOWNLOAD_TIMEOUT = 30
+_DOWNLOAD_ATTEMPTS = 2
+
+# 请求中的股票代码格式: 可选市场前缀 + 6位数字，不区分大小写
+_SYMBOL_RE = re.compile(r"^(?:sh|sz|bj)?\d{6}$", re.IGNORECASE)
+
+
+def normalize_symbols(symbols: List[str]) -> Tuple[List[str], List[str]]:
+    """
+    校验并去重股票代码，保持原有顺序
+
+    Returns:
+        (有效代码列表, 无效代码列表)；大小写不同的重复代码只保留第一个
+    """
+    valid: Dict[str, str] = {}
+    invalid = []
+    for s in symbols:
+        s = s.strip()
+        if _SYMBOL_RE.match(s):
+            valid.setdefault(s.lower(), s)
+        else:
+            invalid.append(s)
+    return list(valid.values()), invalid
+
+
+# 代码前缀 -> 市场，一次切片加一次字典查找代替逐个比较前缀
+_PREFIX_MARKET = MARKET_CODES
+
+
+@lru_cache(maxsize=16384)
+def _parse_symbol(symbol: str) -> Tuple[int, str]:
+    """解析股票代码，返回 (market, code)；结果按代码缓存"""
+    market = _PREFIX_MARKET.get(symbol[:2].lower())
+    if market is not None:
+        return market, symbol[2:]
+    # 无前缀时按代码首位推断: 6/9/5 开头为上海，其余为深圳
+    return (1 if symbol[:1] in ("6", "9", "5") else 0), symbol
+
+
+def _symbols_to_market_codes(symbols: List[str]) -> List[Tuple[int, str]]:
+    """批量解析代码为 [(market, code)]；逐个走 _parse_symbol 的缓存，
+    常用代码命中缓存后比构造 pandas Series 做向量化字符串处理快一个数量级"""
+    return list(map(_parse_symbol, symbols))
+
+# 行业文件每天至多更新一次，但每次刷新都会重新下载到新的临时目录，
+# 因此按文件内容缓存解析结果；内容不变时直接复用，返回的DataFrame不可原地修改
+@lru_cache(maxsize=4)
+def _parse_incon(incon_content: str) -> pd.DataFrame:
+    """解析 incon.dat 行业代码对照表"""
+    hycodes = []
+    blocknames = []
+    types = []
+    section = "Unknown"
+    for i in incon_content.splitlines():
+        if len(i) <= 0:
+            continue
+        if i[0] == '#' and i[1] != '#':
+            section = i[1:].strip("\n ")
+        elif i[1] != '#':
+            item = i.strip('\n ').split('|')
+            hycodes.append(item[0])
+            blocknames.append(item[-1])
+            types.append(section)
+    if not hycodes:
+        return pd.DataFrame()
+    return pd.DataFrame({'hycode': hycodes, 'blockname': blocknames, 'type': types})
+
+
+@lru_cache(maxsize=4)
+def _parse_tdxhy(content: str) -> Tuple[Tuple[str, str], ...]:
+    """
+    解析 tdxhy.cfg 股票行业分类，返回 ((code, hycode), ...)
+
+    每行为 市场|代码|通达信行业|申万行业|...|通达信研究行业，代码之后的每一列都是一个行业代码；
+    逐行拆分直接生成 (代码, 行业代码) 对，不构造 DataFrame 再 melt
+    """
+    pairs = []
+    append = pairs.append
+    for line in content.splitlines():
+        parts = line.split('|')
+        # 过滤 9/2 开头的代码(B股等)
+        if len(parts) < 3 or parts[1][:1] in ('9', '2'):
+            continue
+        code = parts[1]
+        for hycode in parts[2:]:
+            if hycode:
+                append((code, hycode))
+    return tuple(pairs)
+
+
+def _intern_stocks(items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """驻留成分股代码字符串。同一股票出现在几十个板块/行业中，
+    驻留后全部引用同一个字符串对象，显著降低常驻缓存的内存占用"""
+    intern = sys.intern
+    for item in items:
+        stocks = item.get("stocks")
+        if isinstance(stocks, list):
+            item["stocks"] = [intern(c) if isinstance(c, str) else c for c in stocks]
+    return items
+
+
+def _split_batches(items: List[Any], batch_size: int) -> List[List[Any]]:
+    """按 batch_size 切分代码列表(或已解析的 (market, code) 列表)"""
+    batch_size = max(1, batch_size)
+    return [items[i:i + batch_size] for i in range(0, len(items), batch_size)]
 
 
 class TDXClient:
@@ -22,8 +159,11 @@ class TDXClient:
         self.connected = True
         self.current_server = None
         self._cache_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "cache")
-        self._blocks_cache = None
-        self._industries_cache = None
+        # 板块/行业数据的内存缓存: 名称 -> (过期时间, 数据)；每个名称一把锁，保证并发未命中只构建一次，
+        # 且行业的冷启动构建不必等板块构建完成；_reference_lock 只保护锁字典与整体清空
+        self._reference_cache: Dict[str, Tuple[float, List[Dict[str, Any]]]] = {}
+        self._reference_locks: Dict[str, threading.Lock] = {}
+        self._reference_lock = threading.Lock()
     
     def connect(self, server_config: Dict[str, Any]) -> bool:
         """连接到指定服务器"""
@@ -72,6 +212,14 @@ class TDXClient:
             if api is not None:
                 tdx_connection_pool.return_connection(api, server)
     
+    def _map_batches(self, func, batches: List[List[Any]], *args) -> List[Any]:
+        """
+        多个批次各自从连接池借用连接并行执行，结果按批次顺序返回
+
+        所有调用共用 _batch_executor，并发请求再多，分批线程总数也不超过单服务器最大连接数
+        """
+        return list(_batch_executor.map(lambda batch: self._with_connection(func, batch, *args), batches))
+
     def ensure_connected(self) -> bool:
         """确保连接状态"""
         return True  # 连接池模式下总是返回True
@@ -83,78 +231,81 @@ class TDXClient:
             {"market": 1, "name": "上海市场"}
         ]
     
-    def _parse_symbol(self, symbol: str):
-        """解析股票代码"""
-        s = symbol.lower()
-        if s.startswith("sh"):
-            market = 1  # 上海市场
-        elif s.startswith("sz"):
-            market = 0  # 深圳市场
-        else:
-            market = 1  # 默认上海市场
-        code = s.replace("sh", "").replace("sz", "")
-        return market, code
-
     def _json_safe_value(self, v):
         """确保值可被JSON序列化"""
-        try:
-            if isinstance(v, float):
-                if np.isnan(v) or np.isinf(v):
-                    return None
-                return v
-            if isinstance(v, (list, tuple)):
-                return [self._json_safe_value(x) for x in v]
-            if isinstance(v, dict):
-                return {k: self._json_safe_value(val) for k, val in v.items()}
-            return v
-        except Exception:
-            return v
+        if isinstance(v, float):
+            # NaN 与 ±Inf 都不满足该区间比较
+            return v if -math.inf < v < math.inf else None
+        if isinstance(v, (list, tuple)):
+            return [self._json_safe_value(x) for x in v]
+        if isinstance(v, dict):
+            return {k: self._json_safe_value(val) for k, val in v.items()}
+        return v
+
+    def _json_safe_dict(self, r: Dict[str, Any]) -> Dict[str, Any]:
+        """清理扁平字典中的 NaN/Inf，仅对嵌套容器递归"""
+        safe = self._json_safe_value
+        return {
+            k: (v if -math.inf < v < math.inf else None)
+            if isinstance(v, float) else
+            (safe(v) if isinstance(v, (list, tuple, dict)) else v)
+            for k, v in r.items()
+        }
 
     def _json_safe_records(self, records):
         """确保记录列表可被JSON序列化"""
-        try:
-            if isinstance(records, pd.DataFrame):
-                df = records.replace([np.inf, -np.inf], None)
-                df = df.where(pd.notnull(df), None)
-                return df.to_dict("records")
-            if isinstance(records, list):
-                return [self._json_safe_value(r) for r in records]
-            if isinstance(records, dict):
-                return self._json_safe_value(records)
-            return records
-        except Exception:
-            return records
-
-    def _enrich_xdxr(self, records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-        """丰富除权除息数据"""
-        cat_map = {
-            1: "除权除息",
-            2: "送股",
-            3: "配股",
-            4: "现金红利",
-            5: "股本变化",
-            6: "其他"
-        }
-        enriched = []
+        if isinstance(records, list):
+            # pytdx 直接返回 list[dict]，逐字段清理 NaN/Inf，不经过DataFrame
+            safe_dict = self._json_safe_dict
+            safe = self._json_safe_value
+            return [safe_dict(r) if isinstance(r, dict) else safe(r) for r in records]
+        if isinstance(records, pd.DataFrame):
+            # 一次性转为 object 数组，按列用掩码把 NaN/Inf 置为 None
+            # 浮点列直接在 float 数组上判断，整数/布尔列无需检查
+            arr = records.to_numpy(dtype=object)
+            for j, dtype in enumerate(records.dtypes):
+                if dtype.kind == "f":
+                    col = records.iloc[:, j].to_numpy()
+                    bad = ~np.isfinite(col)
+                elif dtype.kind in "iub":
+                    continue
+                else:
+                    bad = pd.isna(arr[:, j])
+                if bad.any():
+                    arr[bad, j] = None
+            cols = list(records.columns)
+            return [dict(zip(cols, row)) for row in arr.tolist()]
+        if isinstance(records, dict):
+            return self._json_safe_value(records)
+        return records
+
+    def _enrich_xdxr(self, records) -> List[Dict[str, Any]]:
+        """清理并丰富除权除息数据：NaN/Inf 清理与日期、类别补充在同一次遍历中完成"""
+        safe_dict = self._json_safe_dict
+        result = []
         for r in records:
-            y = r.get("year")
-            m = r.get("month")
-            d = r.get("day")
-            if r.get("date") is None and all(v is not None for v in [y, m, d]):
-                try:
-                    r["date"] = f"{int(y):04d}-{int(m):02d}-{int(d):02d}"
-                except Exception:
-                    r["date"] = f"{y}-{m}-{d}"
-            cat = r.get("category")
-            if r.get("category_meaning") is None:
-                r["category_meaning"] = cat_map.get(cat, f"类别{cat}" if cat is not None else "类别未知")
-            enriched.append(r)
-        return enriched
+            r = safe_dict(r)
+            result.append(r)
+            get = r.get
+            if get("date") is None:
+                y = get("year")
+                if y is not None:
+                    m = get("month")
+                    d = get("day")
+                    if m is not None and d is not None:
+                        r["date"] = "%04d-%02d-%02d" % (y, m, d)
+            if get("category_meaning") is None:
+                cat = get("category")
+                meaning = _XDXR_CAT_MAP.get(cat)
+                if meaning is None:
+                    meaning = "类别未知" if cat is None else f"类别{cat}"
+                r["category_meaning"] = meaning
+        return result
 
     def get_instrument_info(self, symbol: str) -> Optional[Dict[str, Any]]:
         """获取股票基本信息"""
         def _get_instrument_info(api, symbol):
-            market, code = self._parse_symbol(symbol)
+            market, code = _parse_symbol(symbol)
             try:
                 info = api.get_instrument_info(market, code)
             except Exception:
@@ -192,7 +343,7 @@ class TDXClient:
     def get_security_bars(self, symbol: str, period: int, count: int) -> List[Dict[str, Any]]:
         """获取K线数据"""
         def _get_security_bars(api, symbol, period, count):
-            market, code = self._parse_symbol(symbol)
+            market, code = _parse_symbol(symbol)
             category = period
             data = api.get_security_bars(category, market, code, 0, count)
             if (data is None or len(data) == 0) and period == 9:
@@ -202,18 +353,15 @@ class TDXClient:
                     data = None
             if data is None:
                 return []
-            try:
-                df = api.to_df(data)
-            except Exception:
-                df = pd.DataFrame(data)
-            return self._json_safe_records(df)
+            # pytdx 已返回 list[dict]，直接清理，无需经过DataFrame
+            return self._json_safe_records(data)
         return self._with_connection(_get_security_bars, symbol, period, count)
 
     def get_security_quotes(self, symbols: List[str]) -> List[Dict[str, Any]]:
         """获取实时行情"""
         def _get_security_quotes(api, symbols):
             print(f"[TDX DEBUG] 开始获取实时行情: symbols={symbols}")
-            req = [self._parse_symbol(s) for s in symbols]
+            req = _symbols_to_market_codes(symbols)
             print(f"[TDX DEBUG] 解析后的请求: req={req}")
 
             data = api.get_security_quotes(req)
@@ -223,21 +371,32 @@ class TDXClient:
                 print(f"[TDX ERROR] API返回数据为None: symbols={symbols}")
                 return []
 
-            try:
-                df = api.to_df(data)
-                print(f"[TDX DEBUG] 转换为DataFrame成功: shape={df.shape if hasattr(df, 'shape') else 'N/A'}")
-                return self._json_safe_records(df)
-            except Exception as e:
-                print(f"[TDX ERROR] 转换为DataFrame失败: {e}")
-                print(f"[TDX DEBUG] 尝试直接返回原始数据")
-                return self._json_safe_records(data)
+            # 直接逐条清理 pytdx 返回的 list[dict]；80只行情构造DataFrame再转回
+            # 字典的耗时约为逐条清理的5倍，峰值内存约为2.5倍
+            return self._json_safe_records(list(data))
         return self._with_connection(_get_security_quotes, symbols)
 
+    def get_security_quotes_by_symbol(self, symbols: List[str]) -> Optional[Dict[str, Dict[str, Any]]]:
+        """获取实时行情，按请求中的代码返回 {symbol: quote}；获取失败返回 None"""
+        quotes = self.get_security_quotes(symbols)
+        if quotes is None:
+            return None
+        by_code = {(q.get("market"), q.get("code")): q for q in quotes}
+        result = {}
+        for s in symbols:
+            q = by_code.get(_parse_symbol(s))
+            if q is not None:
+                result[s] = q
+        return result
+
     def get_finance_info(self, symbol: str) -> Optional[Dict[str, Any]]:
         """获取财务信息"""
         def _get_finance_info(api, symbol):
-            market, code = self._parse_symbol(symbol)
+            market, code = _parse_symbol(symbol)
             data = api.get_finance_info(market, code)
+            # pytdx 返回扁平字典（约30个浮点字段），直接单层清理
+            if isinstance(data, dict):
+                return self._json_safe_dict(data)
             return self._json_safe_records(data) if isinstance(data, pd.DataFrame) else self._json_safe_value(data)
         return self._with_connection(_get_finance_info, symbol)
 
@@ -247,91 +406,121 @@ class TDXClient:
             return None
         return self._with_connection(_get_company_report, symbol, report_type)
 
+    def get_company_report_meta(self, symbol: str, report_type: int = 0) -> Tuple[int, bool]:
+        """获取公司报告的大小信息 (data_size, has_data)，报告内容不离开工作线程"""
+        report_data = self.get_company_report(symbol, report_type)
+        return (len(report_data) if report_data else 0), bool(report_data)
+
     def get_batch_security_quotes(self, symbols: List[str], batch_size: int = 80) -> List[Dict[str, Any]]:
         """批量获取实时行情"""
-        def _get_batch_security_quotes(api, symbols, batch_size):
-            all_quotes = []
-            for i in range(0, len(symbols), batch_size):
-                batch_symbols = symbols[i:i + batch_size]
-                req = [self._parse_symbol(s) for s in batch_symbols]
-                data = api.get_security_quotes(req)
-                if data is None:
-                    continue
-                try:
-                    df = api.to_df(data)
-                    all_quotes.extend(self._json_safe_records(df))
-                except Exception:
-                    all_quotes.extend(self._json_safe_records(data))
-            return all_quotes
-        return self._with_connection(_get_batch_security_quotes, symbols, batch_size)
+        def _get_batch_security_quotes(api, req):
+            data = api.get_security_quotes(req)
+            if data is None:
+                return []
+            return self._json_safe_records(list(data))
+
+        # 整个列表只解析一次，各批次直接切片 (market, code) 列表
+        batches = _split_batches(_symbols_to_market_codes(symbols), batch_size)
+        if len(batches) <= 1:
+            return self._with_connection(_get_batch_security_quotes, batches[0] if batches else [])
+
+        results = [rs for rs in self._map_batches(_get_batch_security_quotes, batches) if rs is not None]
+        if not results:
+            return None
+        # 各批次结果都是新建的列表，直接追加到第一批上，不再复制一份完整列表
+        quotes = results[0]
+        for rs in results[1:]:
+            quotes.extend(rs)
+        return quotes
 
     def get_batch_security_bars(self, symbols: List[str], period: int = 9, count: int = 100, batch_size: int = 10) -> Dict[str, List]:
         """批量获取K线数据"""
-        def _get_batch_security_bars(api, symbols, period, count, batch_size):
+        def _get_batch_security_bars(api, batch_symbols, period, count):
             all_bars = {}
             category = period
-            for i in range(0, len(symbols), batch_size):
-                batch_symbols = symbols[i:i + batch_size]
-                for symbol in batch_symbols:
-                    market, code = self._parse_symbol(symbol)
-                    data = api.get_security_bars(category, market, code, 0, count)
+            for symbol in batch_symbols:
+                market, code = _parse_symbol(symbol)
+                data = api.get_security_bars(category, market, code, 0, count)
+                if data is None:
+                    if period == 9:
+                        try:
+                            data = api.get_security_bars(4, market, code, 0, count)
+                        except Exception:
+                            data = None
                     if data is None:
-                        if period == 9:
-                            try:
-                                data = api.get_security_bars(4, market, code, 0, count)
-                            except Exception:
-                                data = None
-                        if data is None:
-                            all_bars[symbol] = []
-                            continue
-                    try:
-                        df = api.to_df(data)
-                        all_bars[symbol] = self._json_safe_records(df)
-                    except Exception:
-                        all_bars[symbol] = self._json_safe_records(data)
+                        all_bars[symbol] = []
+                        continue
+                all_bars[symbol] = self._json_safe_records(data)
             return all_bars
-        return self._with_connection(_get_batch_security_bars, symbols, period, count, batch_size)
+
+        # 每只股票都是一次独立的往返，批次过少时缩小批次，让各只股票分散到多个连接上并行获取
+        per_conn = -(-len(symbols) // tdx_connection_pool.max_connections) if symbols else 1
+        batches = _split_batches(symbols, min(batch_size, per_conn))
+        if len(batches) <= 1:
+            return self._with_connection(_get_batch_security_bars, symbols, period, count)
+
+        results = self._map_batches(_get_batch_security_bars, batches, period, count)
+        if all(r is None for r in results):
+            return None
+        all_bars = {}
+        for batch, rs in zip(batches, results):
+            rs = rs or {}
+            for symbol in batch:
+                all_bars[symbol] = rs.get(symbol, [])
+        return all_bars
 
     def get_xdxr_info(self, symbol: str) -> List[Dict[str, Any]]:
         """获取除权除息信息"""
         def _get_xdxr_info(api):
-            market, code = self._parse_symbol(symbol)
+            market, code = _parse_symbol(symbol)
             data = api.get_xdxr_info(market, code)
             if data is None:
                 return []
-            try:
-                df = api.to_df(data)
-                rs = self._json_safe_records(df)
-                return self._enrich_xdxr(rs)
-            except Exception:
-                rs = self._json_safe_records(data)
-                return self._enrich_xdxr(rs if isinstance(rs, list) else [rs])
+            # pytdx 已返回 list[dict]，日期直接按年月日格式化，不经过DataFrame/strftime
+            return self._enrich_xdxr(data)
         return self._with_connection(_get_xdxr_info)
 
-    def get_stock_blocks(self) -> List[Dict[str, Any]]:
-        """获取板块数据"""
-        def _get_stock_blocks(api):
-            try:
-                print("开始获取板块数据")
-            except Exception:
-                pass
-            try:
-                if isinstance(self._blocks_cache, list) and len(self._blocks_cache) > 0:
-                    return self._blocks_cache
-            except Exception:
-                pass
+    def _reference_data(self, name: str, build) -> Optional[List[Dict[str, Any]]]:
+        """
+        板块/行业等变化缓慢的数据：内存缓存 -> 文件缓存(cache/<name>.json, 24小时) -> 通过 build(api) 重新构建
+
+        命中内存或文件缓存时不占用TDX连接；构建失败或结果为空时返回None
+        """
+        entry = self._reference_cache.get(name)
+        if entry is not None and entry[0] > time.time():
+            return entry[1]
+        with self._reference_lock:
+            lock = self._reference_locks.setdefault(name, threading.Lock())
+        with lock:
+            entry = self._reference_cache.get(name)
+            if entry is not None and entry[0] > time.time():
+                return entry[1]
 
             from ..services.cache import CacheService
             cache_service = CacheService(self._cache_dir)
+            file_name = f"{name}.json"
 
-            cached = cache_service.load_cache("blocks.json")
-            if isinstance(cached, list) and len(cached) > 0:
-                try:
-                    self._blocks_cache = cached
-                except Exception:
-                    pass
-                return cached
-
+            data = cache_service.load_cache(file_name)
+            if not (isinstance(data, list) and len(data) > 0):
+                data = self._with_connection(build)
+                if not data:
+                    return None
+                cache_service.save_cache(file_name, data)
+            data = _intern_stocks(data)
+            self._reference_cache[name] = (time.time() + RESPONSE_CACHE_TTL.get(name, 3600), data)
+            return data
+
+    def invalidate_reference_cache(self) -> int:
+        """清空板块/行业内存缓存，返回清除的条目数；文件缓存由调用方按需删除"""
+        with self._reference_lock:
+            n = len(self._reference_cache)
+            self._reference_cache.clear()
+            return n
+
+    def get_stock_blocks(self) -> Optional[List[Dict[str, Any]]]:
+        """获取板块数据"""
+        def _get_stock_blocks(api):
+            print("开始获取板块数据")
             files = [
                 ("block.dat", "yb"),
                 ("block_fg.dat", "fg"),
@@ -358,64 +547,35 @@ class TDXClient:
             except Exception:
                 pass
 
-            def _is_a_share(c: str):
-                try:
-                    return (
-                        c.startswith("000") or c.startswith("001") or c.startswith("002") or
-                        c.startswith("003") or c.startswith("200") or c.startswith("300") or
-                        c.startswith("301") or c.startswith("600") or c.startswith("601") or
-                        c.startswith("603") or c.startswith("605") or c.startswith("688")
-                    ) and len(c) == 6
-                except Exception:
-                    return False
-
             try:
-                data = data[data["code"].apply(_is_a_share)]
+                data = data[a_share_mask(data["code"])]
                 data = data.drop_duplicates(subset=["blockname", "code", "blocktype"], keep="first")
             except Exception:
                 pass
 
             blocks = []
             try:
-                if "blockname" in data.columns and "code" in data.columns:
-                    for (bn, bt), group in data.groupby(["blockname", "blocktype"], as_index=False):
-                        stocks = sorted(set(group["code"].tolist()))
-                        blocks.append({"blockname": bn, "blocktype": bt, "stocks": stocks})
+                if "blockname" in data.columns and "code" in data.columns and len(data) > 0:
+                    # 排序去重后按 (blockname, blocktype) 边界切分，避免逐组构造集合
+                    keys = ["blockname", "blocktype", "code"]
+                    d = data.sort_values(keys).drop_duplicates(keys)
+                    bn = d["blockname"].to_numpy()
+                    bt = d["blocktype"].to_numpy()
+                    codes = d["code"].to_numpy()
+                    bounds = np.flatnonzero((bn[1:] != bn[:-1]) | (bt[1:] != bt[:-1])) + 1
+                    starts = np.concatenate(([0], bounds))
+                    for start, chunk in zip(starts.tolist(), np.split(codes, bounds)):
+                        blocks.append({"blockname": bn[start], "blocktype": bt[start], "stocks": chunk.tolist()})
             except Exception:
                 return []
 
-            try:
-                self._blocks_cache = blocks
-                cache_service.save_cache("blocks.json", blocks)
-            except Exception:
-                pass
             return blocks
-        return self._with_connection(_get_stock_blocks)
+        return self._reference_data("blocks", _get_stock_blocks)
 
-    def get_industry_info(self) -> List[Dict[str, Any]]:
+    def get_industry_info(self) -> Optional[List[Dict[str, Any]]]:
         """获取行业数据"""
         def _get_industry_info(api):
-            try:
-                print("开始获取行业数据")
-            except Exception:
-                pass
-            try:
-                if isinstance(self._industries_cache, list) and len(self._industries_cache) > 0:
-                    return self._industries_cache
-            except Exception:
-                pass
-
-            from ..services.cache import CacheService
-            cache_service = CacheService(self._cache_dir)
-
-            cached = cache_service.load_cache("industries.json")
-            if isinstance(cached, list) and len(cached) > 0:
-                try:
-                    self._industries_cache = cached
-                except Exception:
-                    pass
-                return cached
-
+            print("开始获取行业数据")
             incon_block_info = None
             try:
                 content = api.get_block_dat_ver_up("incon.dat")
@@ -438,35 +598,14 @@ class TDXClient:
                     "stocks": r.get("stocks", []),
                     "count": r.get("stock_count", 0)
                 } for r in data]
-                try:
-                    self._industries_cache = rs
-                    cache_service.save_cache("industries.json", rs)
-                except Exception:
-                    pass
                 return rs
             except Exception:
                 return []
-        return self._with_connection(_get_industry_info)
+        return self._reference_data("industries", _get_industry_info)
 
     def _parse_block_name_info(self, incon_content: str) -> pd.DataFrame:
         """解析行业代码对照表"""
-        incon_content = incon_content.splitlines()
-        incon_dict = []
-        section = "Unknown"
-        for i in incon_content:
-            if len(i) <= 0:
-                continue
-            if i[0] == '#' and i[1] != '#':
-                section = i[1:].strip("\n ")
-            elif i[1] != '#':
-                item = i.strip('\n ').split('|')
-                incon_dict.append({
-                    'hycode': item[0],
-                    'blockname': item[-1],
-                    'type': section
-                })
-
-        return pd.DataFrame(incon_dict)
+        return _parse_incon(incon_content)
 
     def _download_tdx_file(self, withZHB: bool = True) -> str:
         """下载通达信数据文件"""
@@ -480,43 +619,76 @@ class TDXClient:
         shutil.rmtree(tmpdir, ignore_errors=True)
         os.makedirs(tmpdir)
 
+        download_dir = os.path.join(self._cache_dir, "tdx_downloads")
+        os.makedirs(download_dir, exist_ok=True)
+
+        def _fetch(url):
+            """条件下载到 cache/tdx_downloads：服务端文件未变化(304)时直接复用本地副本，
+            否则按块写入磁盘，内存占用与文件大小无关"""
+            path = os.path.join(download_dir, url.rsplit("/", 1)[-1])
+            meta_path = path + ".meta"
+            req = Request(url)
+            if os.path.exists(path):
+                try:
+                    with open(meta_path, encoding="utf-8") as f:
+                        meta = json.load(f)
+                    if meta.get("last_modified"):
+                        req.add_header("If-Modified-Since", meta["last_modified"])
+                    if meta.get("etag"):
+                        req.add_header("If-None-Match", meta["etag"])
+                except (OSError, ValueError):
+                    pass
+            # 连接/DNS 等网络错误重试一次；HTTP 错误(含304)不重试
+            for attempt in range(_DOWNLOAD_ATTEMPTS):
+                try:
+                    with urlopen(req, timeout=_DOWNLOAD_TIMEOUT) as resp:
+                        tmp_path = path + ".part"
+                        with open(tmp_path, "wb") as out:
+                            shutil.copyfileobj(resp, out, 64 * 1024)
+                        os.replace(tmp_path, path)
+                        with open(meta_path, "w", encoding="utf-8") as f:
+                            json.dump({"last_modified": resp.headers.get("Last-Modified"),
+                                       "etag": resp.headers.get("ETag")}, f)
+                except HTTPError as e:
+                    if e.code != 304:
+                        raise
+                except (URLError, TimeoutError):
+                    if attempt + 1 >= _DOWNLOAD_ATTEMPTS:
+                        raise
+                    continue
+                return path
+
+        def _extract(path):
+            # 嵌套的 zhb.zip 在内存中展开，不落临时文件
+            with ZipFile(path) as z:
+                names = z.namelist()
+                z.extractall(tmpdir, members=[n for n in names if n != "zhb.zip"])
+                if "zhb.zip" in names:
+                    with ZipFile(BytesIO(z.read("zhb.zip"))) as zhb:
+                        zhb.extractall(tmpdir)
+
         try:
-            for url in urls if withZHB else urls[:-1]:
-                file = tmpdir + '/' + 'tmp.zip'
-                f = urlopen(url)
-                data = f.read()
-                with open(file, 'wb') as code:
-                    code.write(data)
-                f.close()
-                shutil.unpack_archive(file, extract_dir=tmpdir)
-                zhb = os.path.join(tmpdir, "zhb.zip")
-                if os.path.exists(zhb):
-                    shutil.unpack_archive(zhb, extract_dir=tmpdir)
-                os.remove(file)
+            targets = urls if withZHB else urls[:-1]
+            # 多个文件并行下载，解压仍按顺序进行
+            with ThreadPoolExecutor(max_workers=len(targets)) as pool:
+                archives = list(pool.map(_fetch, targets))
+            for path in archives:
+                _extract(path)
         except Exception as e:
             print(f"下载通达信文件失败: {e}")
 
         return tmpdir
 
-    def _read_industry(self, folder: str) -> pd.DataFrame:
-        """读取行业分类文件"""
+    def _read_industry(self, folder: str) -> Tuple[Tuple[str, str], ...]:
+        """读取行业分类文件，返回 ((code, hycode), ...)"""
         fhy = folder + '/tdxhy.cfg'
         try:
             with open(fhy, encoding='GB18030', mode='r') as f:
-                hy = f.readlines()
-            hy = [line.replace('\n', '') for line in hy]
-            hy = pd.DataFrame(line.split('|') for line in hy)
-            # 过滤代码
-            hy = hy[~hy[1].str.startswith('9')]
-            hy = hy[~hy[1].str.startswith('2')]
-
-            df = hy.rename({0: 'sse', 1: 'code', 2: 'tdx_code', 3: 'sw_code', 5: 'tdxrshy_code'}, axis=1). \
-                reset_index(drop=True). \
-                melt(id_vars=('sse', 'code'), value_name='hycode')
-            return df
+                content = f.read()
+            return _parse_tdxhy(content)
         except Exception as e:
             print(f"读取行业文件失败: {e}")
-            return pd.DataFrame()
+            return ()
 
     def _get_tdx_industry_data(self, incon_block_info=None) -> Optional[List[Dict[str, Any]]]:
         """获取通达信行业数据"""
@@ -533,17 +705,26 @@ class TDXClient:
                     incon_content = f.read()
                 incon_block_info = self._parse_block_name_info(incon_content)
 
-            df = self._read_industry(folder).merge(incon_block_info, on='hycode')
-            df.set_index('code', drop=False, inplace=True)
+            # 行业代码 -> 行业名称，重复的行业代码取第一个名称
+            name_by_hycode = {}
+            for hycode, name in zip(incon_block_info['hycode'], incon_block_info['blockname']):
+                name_by_hycode.setdefault(hycode, name)
+
+            # 按行业代码分组成分股，只保留对照表中存在的行业
+            stocks_by_hycode = defaultdict(list)
+            for code, hycode in self._read_industry(folder):
+                if hycode in name_by_hycode:
+                    stocks_by_hycode[hycode].append(code)
 
-            # 转换为行业信息列表
+            # 转换为行业信息列表，按行业代码排序
             industry_info = []
-            for hycode, group in df.groupby('hycode'):
+            for hycode in sorted(stocks_by_hycode):
+                stocks = stocks_by_hycode[hycode]
                 industry_info.append({
                     'industry_code': hycode,
-                    'industry_name': group['blockname'].iloc[0],
-                    'stock_count': len(group),
-                    'stocks': group['code'].tolist()
+                    'industry_name': name_by_hycode[hycode],
+                    'stock_count': len(stocks),
+                    'stocks': stocks
                 })
 
             return industry_info
@@ -1,7 +1,12 @@
 """TDX连接池管理 - 支持多服务器、失败重试和自动切换"""
-import queue
+import os
 import time
+import select
 import threading
+from collections import deque
+from functools import reduce
+from math import gcd
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from threading import Thread, Lock
 from typing import Dict, Any, Optional, List, Tuple
 
@@ -9,6 +14,8 @@ from pytdx.hq import TdxHq_API
 
 from config import TDX_SERVERS
 
+_HAS_POLL = hasattr(select, "poll")
+
 
 class ServerStatus:
     """服务器状态"""
@@ -17,6 +24,23 @@ class ServerStatus:
     UNKNOWN = "unknown"
 
 
+def _wrr_iter(items: List[Any], weights: List[int]):
+    """加权轮询(LVS WRR)：按权重比例循环产出 items 中的元素"""
+    n = len(items)
+    g = reduce(gcd, weights)
+    max_weight = max(weights)
+    i = -1
+    cw = 0
+    while True:
+        i = (i + 1) % n
+        if i == 0:
+            cw -= g
+            if cw <= 0:
+                cw = max_weight
+        if weights[i] >= cw:
+            yield items[i]
+
+
 class TDXConnectionPool:
     """TDX连接池，支持多服务器管理、失败重试和自动切换"""
 
@@ -28,7 +52,9 @@ class TDXConnectionPool:
         retry_times: int = 3,
         health_check_interval: int = 60,
         unhealthy_threshold: int = 3,
-        recovery_time: int = 300
+        recovery_time: int = 300,
+        load_balance: Optional[str] = None,
+        idle_check_interval: float = 60
     ):
         """
         初始化连接池
@@ -41,6 +67,10 @@ class TDXConnectionPool:
             health_check_interval: 健康检查间隔(秒)
             unhealthy_threshold: 连续失败多少次标记为不健康
             recovery_time: 不健康服务器恢复检查间隔(秒)
+            load_balance: 多服务器分流方式；"wrr" 按连接延迟加权轮询，"least" 选择
+                (在用连接数+1)*延迟最小的服务器；为空时始终优先当前服务器
+            idle_check_interval: 空闲超过该秒数的连接借出前先发心跳确认，
+                近期用过的连接只做零超时套接字检查
         """
         self.servers = servers or TDX_SERVERS.copy()
         self.max_connections = max_connections
@@ -49,6 +79,8 @@ class TDXConnectionPool:
         self.health_check_interval = health_check_interval
         self.unhealthy_threshold = unhealthy_threshold
         self.recovery_time = recovery_time
+        self.load_balance = load_balance
+        self.idle_check_interval = idle_check_interval
 
         # 当前主服务器索引
         self._current_server_index = 0
@@ -63,21 +95,40 @@ class TDXConnectionPool:
                 "last_success_time": 0
             }
 
-        # 连接池 (每个服务器一个队列)
-        self._pools: Dict[str, queue.Queue] = {}
+        # 连接池 (每个服务器一个空闲连接队列，元素为 (api, 放回时间)，由 _pool_lock 保护，只做非阻塞存取)
+        self._pools: Dict[str, deque] = {}
+        # 已借出未归还的连接数，借出/归还时在 _pool_lock 内增减，状态查询直接读取
+        self._in_use: Dict[str, int] = {}
         for server in self.servers:
-            self._pools[server["ip"]] = queue.Queue(maxsize=max_connections)
+            self._pools[server["ip"]] = deque()
+            self._in_use[server["ip"]] = 0
 
         # 锁
         self._lock = Lock()
+        self._pool_lock = Lock()
+        # 有连接放回空闲队列时通知，重试等待中的调用方可立即取用
+        self._idle_available = threading.Condition(self._pool_lock)
+
+        # 各服务器建连耗时的指数移动平均(毫秒)，用于计算加权轮询的权重
+        self._latency: Dict[str, float] = {}
+        # 加权轮询迭代器，健康检查时按最新延迟重建；生成器不可并发 next，由 _wrr_lock 保护
+        self._wrr = None
+        self._wrr_lock = Lock()
+
+        # 池中连接被取空时置位，唤醒后台线程立即补充连接
+        self._needs_refill = threading.Event()
+        # 连接池关闭后置位，后台线程退出且不再向池中放入新连接
+        self._stopped = threading.Event()
+
+        # 健康检查时并行探测各服务器用的线程池
+        self._health_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="tdx-health")
 
         # 启动后台线程
+        # 预热完成后置位；预热在后台线程中进行，不阻塞模块导入和服务启动
+        self.ready = threading.Event()
         self._health_check_thread = Thread(target=self._health_check_worker, daemon=True)
         self._health_check_thread.start()
 
-        # 预热连接池
-        self._warmup_pool()
-
     @property
     def server(self) -> Dict[str, Any]:
         """获取当前主服务器"""
@@ -100,26 +151,80 @@ class TDXConnectionPool:
                 "last_fail_time": 0,
                 "last_success_time": 0
             }
-            self._pools[server["ip"]] = queue.Queue(maxsize=self.max_connections)
+            self._pools[server["ip"]] = deque()
+            self._in_use[server["ip"]] = 0
             self._current_server_index = len(self.servers) - 1
             print(f"[连接池] 添加并切换到新服务器: {server.get('name', server['ip'])}")
 
     def _warmup_pool(self):
-        """预热连接池 - 为当前服务器创建初始连接"""
+        """预热连接池 - 为当前服务器并行建立 max_connections 个连接，总耗时约为一次握手"""
         server = self.server
         print(f"[连接池] 预热连接池，服务器: {server.get('name', server['ip'])}")
-        for _ in range(min(2, self.max_connections)):
-            api = self._create_connection_to_server(server)
+        futures = [self._health_executor.submit(self._create_connection_to_server, server)
+                   for _ in range(self.max_connections)]
+        for fut in as_completed(futures):
+            api = fut.result()
             if api:
-                self._pools[server["ip"]].put(api)
+                if not self._put_idle(server["ip"], api):
+                    api.disconnect()
                 self._mark_server_healthy(server["ip"])
 
+    def _take_idle(self, ip: str) -> Optional[Tuple[TdxHq_API, float]]:
+        """取出一个空闲连接 (api, 放回时间)，没有则返回None；取空时通知后台补充"""
+        with self._pool_lock:
+            pool = self._pools.get(ip)
+            if not pool:
+                return None
+            entry = pool.popleft()
+            if not pool:
+                self._needs_refill.set()
+            return entry
+
+    def _put_idle(self, ip: str, api: TdxHq_API) -> bool:
+        """放回空闲连接，池已满、服务器不存在或连接池已关闭时返回False"""
+        with self._pool_lock:
+            pool = self._pools.get(ip)
+            if pool is None or len(pool) >= self.max_connections or self._stopped.is_set():
+                return False
+            pool.append((api, time.monotonic()))
+            self._idle_available.notify()
+            return True
+
+    def _count_checkout(self, ip: str, delta: int):
+        """借出(+1)/归还(-1)时更新在用连接数"""
+        with self._pool_lock:
+            self._in_use[ip] = max(0, self._in_use.get(ip, 0) + delta)
+
+    def _wait_idle(self, ip: str, timeout: float) -> Optional[Tuple[TdxHq_API, float]]:
+        """等待最多 timeout 秒，期间有连接放回该服务器的空闲队列时立即取出 (api, 放回时间)"""
+        with self._idle_available:
+            if not self._idle_available.wait_for(lambda: self._pools.get(ip), timeout):
+                return None
+            return self._pools[ip].popleft()
+
+    def _idle_count(self, ip: str) -> int:
+        """空闲连接数"""
+        pool = self._pools.get(ip)
+        return len(pool) if pool is not None else 0
+
+    def _drain_idle(self, ip: str) -> List[TdxHq_API]:
+        """取出全部空闲连接"""
+        with self._pool_lock:
+            pool = self._pools.get(ip)
+            if not pool:
+                return []
+            apis = [api for api, _ in pool]
+            pool.clear()
+            return apis
+
     def _create_connection_to_server(self, server: Dict[str, Any]) -> Optional[TdxHq_API]:
         """创建到指定服务器的连接"""
         api = TdxHq_API()
         try:
+            start = time.perf_counter()
             ok = api.connect(server["ip"], server["port"], time_out=self.connect_timeout)
             if ok:
+                self._record_latency(server["ip"], (time.perf_counter() - start) * 1000)
                 return api
         except Exception as e:
             print(f"[连接池] 连接服务器失败 {server.get('name', server['ip'])}: {e}")
@@ -130,6 +235,33 @@ class TDXConnectionPool:
             pass
         return None
 
+    def _record_latency(self, ip: str, ms: float, alpha: float = 0.3):
+        """更新服务器延迟的指数移动平均"""
+        prev = self._latency.get(ip)
+        self._latency[ip] = ms if prev is None else prev + alpha * (ms - prev)
+
+    def _rebuild_wrr(self):
+        """按最新延迟重建加权轮询，权重与延迟成反比；没有延迟样本的服务器权重为1"""
+        servers = [s for s in self.servers
+                   if self._server_status.get(s["ip"], {}).get("status") != ServerStatus.UNHEALTHY]
+        if not servers:
+            servers = list(self.servers)
+        weights = [max(1, int(1000 / max(self._latency.get(s["ip"], 1000.0), 1.0))) for s in servers]
+        with self._wrr_lock:
+            self._wrr = _wrr_iter(servers, weights)
+
+    def _expected_wait(self, server: Dict[str, Any]) -> float:
+        """估算新请求落到该服务器的等待代价：在用连接越多、延迟越高代价越大"""
+        ip = server["ip"]
+        return (self._in_use.get(ip, 0) + 1) * self._latency.get(ip, 1000.0)
+
+    def _next_balanced(self) -> Dict[str, Any]:
+        """取加权轮询的下一个服务器"""
+        if self._wrr is None:
+            self._rebuild_wrr()
+        with self._wrr_lock:
+            return next(self._wrr)
+
     def _mark_server_healthy(self, ip: str):
         """标记服务器为健康状态"""
         with self._lock:
@@ -181,6 +313,19 @@ class TDXConnectionPool:
 
         return available
 
+    def ordered_servers(self) -> List[Dict[str, Any]]:
+        """本次请求尝试的服务器顺序：可用服务器中按负载均衡策略选出的优先，其余按原顺序作为后备"""
+        available_servers = self._get_available_servers()
+        if self.load_balance and len(available_servers) > 1:
+            if self.load_balance == "least":
+                preferred = min(available_servers, key=self._expected_wait)
+            else:
+                preferred = self._next_balanced()
+            if preferred in available_servers:
+                available_servers.remove(preferred)
+                available_servers.insert(0, preferred)
+        return available_servers
+
     def _switch_to_next_server(self) -> bool:
         """切换到下一个可用服务器"""
         with self._lock:
@@ -206,29 +351,27 @@ class TDXConnectionPool:
         Returns:
             (api, server): 连接对象和对应的服务器信息，失败返回 (None, None)
         """
-        available_servers = self._get_available_servers()
-
-        for server in available_servers:
-            pool = self._pools.get(server["ip"])
-
-            # 尝试从池中获取
-            if pool and not pool.empty():
+        # 启动后的第一批请求等待预热完成，直接复用预热的连接，避免各自再握手一次
+        if not self.ready.is_set():
+            self.ready.wait(self.connect_timeout)
+        for server in self.ordered_servers():
+            # 尝试从池中获取，失效的连接断开后继续取下一个，最多 retry_times 个
+            for _ in range(self.retry_times):
+                entry = self._take_idle(server["ip"])
+                if entry is None:
+                    break
+                api, last_used = entry
+                if self._is_reusable(api, last_used):
+                    self._mark_server_healthy(server["ip"])
+                    self._count_checkout(server["ip"], 1)
+                    return api, server
                 try:
-                    api = pool.get_nowait()
-                    # 验证连接是否有效
-                    if self._test_connection(api):
-                        self._mark_server_healthy(server["ip"])
-                        return api, server
-                    else:
-                        # 连接无效，断开并继续
-                        try:
-                            api.disconnect()
-                        except Exception:
-                            pass
-                except queue.Empty:
+                    api.disconnect()
+                except Exception:
                     pass
 
-            # 池中没有可用连接，创建新连接
+            # 池中没有可用连接，通知后台补充，并同步创建新连接
+            self._needs_refill.set()
             for attempt in range(self.retry_times):
                 api = self._create_connection_to_server(server)
                 if api:
@@ -239,11 +382,22 @@ class TDXConnectionPool:
                             with self._lock:
                                 self._current_server_index = i
                             break
+                    self._count_checkout(server["ip"], 1)
                     return api, server
 
-                # 连接失败，短暂等待后重试
+                # 连接失败，等待重试期间若有连接归还则直接使用，否则到时后重试
                 if attempt < self.retry_times - 1:
-                    time.sleep(0.5)
+                    entry = self._wait_idle(server["ip"], 0.5)
+                    if entry is not None:
+                        api, last_used = entry
+                        if self._is_reusable(api, last_used):
+                            self._mark_server_healthy(server["ip"])
+                            self._count_checkout(server["ip"], 1)
+                            return api, server
+                        try:
+                            api.disconnect()
+                        except Exception:
+                            pass
 
             # 该服务器所有重试都失败
             self._mark_server_failed(server["ip"])
@@ -251,6 +405,14 @@ class TDXConnectionPool:
         print("[连接池] 所有服务器连接失败")
         return None, None
 
+    def _is_reusable(self, api: TdxHq_API, last_used: float) -> bool:
+        """借出前检查空闲连接：近期放回的只做零超时套接字检查，空闲较久的再发一次心跳"""
+        if not self._is_socket_alive(api):
+            return False
+        if time.monotonic() - last_used <= self.idle_check_interval:
+            return True
+        return self._test_connection(api)
+
     def _test_connection(self, api: TdxHq_API) -> bool:
         """测试连接是否有效"""
         try:
@@ -266,81 +428,141 @@ class TDXConnectionPool:
             return
 
         server_ip = server["ip"] if server else self.server["ip"]
-        pool = self._pools.get(server_ip)
+        self._count_checkout(server_ip, -1)
 
-        try:
-            if pool and not pool.full():
-                pool.put_nowait(api)
-            else:
-                try:
-                    api.disconnect()
-                except Exception:
-                    pass
-        except Exception:
+        if not self._is_socket_alive(api) or not self._put_idle(server_ip, api):
             try:
                 api.disconnect()
             except Exception:
                 pass
 
+    @staticmethod
+    def _is_socket_alive(api: TdxHq_API) -> bool:
+        """零超时 select 检查空闲连接：一次请求应答完成后套接字不应可读，
+        可读意味着服务器已关闭连接(FIN)或残留了未读数据，都不应放回池中"""
+        sock = getattr(api, "client", None)
+        if sock is None:
+            return False
+        try:
+            # select.select 不支持编号 >= 1024 的文件描述符，繁忙进程中会误判所有连接失效；
+            # 有 poll 的平台(Linux/macOS)用 poll，Windows 的 select 按数量而非编号受限
+            if _HAS_POLL:
+                poller = select.poll()
+                poller.register(sock, select.POLLIN)
+                return not poller.poll(0)
+            readable, _, _ = select.select([sock], [], [], 0)
+            return not readable
+        except Exception:
+            return False
+
     def _health_check_worker(self):
-        """后台健康检查线程"""
-        while True:
+        """后台健康检查线程，先预热连接池；之后按间隔做完整检查，连接池被取空时提前唤醒只补充连接"""
+        try:
+            self._warmup_pool()
+        except Exception as e:
+            print(f"[连接池] 预热连接池失败: {e}")
+        finally:
+            self.ready.set()
+        # 按上次完整检查的时间判断是否到期，持续的补充唤醒不会让完整检查一直推迟
+        last_check = time.monotonic()
+        while not self._stopped.is_set():
             try:
-                time.sleep(self.health_check_interval)
-                self._do_health_check()
+                remaining = self.health_check_interval - (time.monotonic() - last_check)
+                refill = remaining > 0 and self._needs_refill.wait(remaining)
+                self._needs_refill.clear()
+                if self._stopped.is_set():
+                    break
+                if time.monotonic() - last_check >= self.health_check_interval:
+                    self._do_health_check()
+                    last_check = time.monotonic()
+                elif refill:
+                    self._do_refill()
             except Exception as e:
                 print(f"[连接池] 健康检查异常: {e}")
-                time.sleep(10)
+                self._stopped.wait(10)
 
     def _do_health_check(self):
-        """执行健康检查"""
-        for server in self.servers:
-            ip = server["ip"]
-            status = self._server_status.get(ip, {})
+        """执行健康检查：各服务器的恢复探测与连接补充并行进行，总耗时取决于最慢的服务器而非总和"""
+        futures = [self._health_executor.submit(self._check_server, server) for server in list(self.servers)]
+        for fut in as_completed(futures):
+            try:
+                fut.result()
+            except Exception as e:
+                print(f"[连接池] 服务器检查异常: {e}")
+        if self.load_balance == "wrr":
+            self._rebuild_wrr()
+
+    def _do_refill(self):
+        """按需补充：只为空闲连接不足的健康服务器建连，不做恢复探测和权重刷新"""
+        target = min(2, self.max_connections)
+        futures = [
+            self._health_executor.submit(self._fill_server, server) for server in list(self.servers)
+            if self._server_status.get(server["ip"], {}).get("status") == ServerStatus.HEALTHY
+            and self._idle_count(server["ip"]) < target
+        ]
+        for fut in as_completed(futures):
+            try:
+                fut.result()
+            except Exception as e:
+                print(f"[连接池] 补充连接异常: {e}")
 
-            # 对不健康的服务器尝试恢复
-            if status.get("status") == ServerStatus.UNHEALTHY:
-                last_fail = status.get("last_fail_time", 0)
-                if time.time() - last_fail >= self.recovery_time:
-                    print(f"[连接池] 尝试恢复服务器: {server.get('name', ip)}")
-                    api = self._create_connection_to_server(server)
-                    if api:
-                        self._mark_server_healthy(ip)
-                        self._pools[ip].put(api)
-                        print(f"[连接池] 服务器已恢复: {server.get('name', ip)}")
-
-            # 为健康的服务器维护连接池
-            elif status.get("status") == ServerStatus.HEALTHY:
-                pool = self._pools.get(ip)
-                if pool and pool.qsize() < 2:
-                    api = self._create_connection_to_server(server)
-                    if api:
-                        try:
-                            pool.put_nowait(api)
-                        except queue.Full:
-                            api.disconnect()
+    def _fill_server(self, server: Dict[str, Any]):
+        """补足服务器的空闲连接"""
+        ip = server["ip"]
+        while self._idle_count(ip) < min(2, self.max_connections):
+            api = self._create_connection_to_server(server)
+            if not api:
+                break
+            if not self._put_idle(ip, api):
+                api.disconnect()
+                break
+
+    def _check_server(self, server: Dict[str, Any]):
+        """检查单个服务器：不健康的到期尝试恢复，健康的补足空闲连接"""
+        ip = server["ip"]
+        status = self._server_status.get(ip, {})
+
+        # 对不健康的服务器尝试恢复
+        if status.get("status") == ServerStatus.UNHEALTHY:
+            last_fail = status.get("last_fail_time", 0)
+            if time.time() - last_fail >= self.recovery_time:
+                print(f"[连接池] 尝试恢复服务器: {server.get('name', ip)}")
+                api = self._create_connection_to_server(server)
+                if api:
+                    self._mark_server_healthy(ip)
+                    if not self._put_idle(ip, api):
+                        api.disconnect()
+                    print(f"[连接池] 服务器已恢复: {server.get('name', ip)}")
+
+        # 为健康的服务器维护连接池
+        elif status.get("status") == ServerStatus.HEALTHY:
+            self._fill_server(server)
 
     def close_all(self):
         """关闭所有连接"""
-        for ip, pool in self._pools.items():
-            while not pool.empty():
+        for ip in list(self._pools.keys()):
+            for api in self._drain_idle(ip):
                 try:
-                    api = pool.get_nowait()
                     api.disconnect()
                 except Exception:
                     pass
 
+    def shutdown(self, timeout: float = 5):
+        """关闭连接池：停止后台健康检查线程，之后断开所有空闲连接，借出的连接归还时直接断开"""
+        self._stopped.set()
+        self._needs_refill.set()
+        self._health_check_thread.join(timeout)
+        self._health_executor.shutdown(wait=False, cancel_futures=True)
+        self.close_all()
+
     def reset_pool(self, server_ip: str = None):
         """重置连接池"""
         if server_ip:
-            pool = self._pools.get(server_ip)
-            if pool:
-                while not pool.empty():
-                    try:
-                        api = pool.get_nowait()
-                        api.disconnect()
-                    except Exception:
-                        pass
+            for api in self._drain_idle(server_ip):
+                try:
+                    api.disconnect()
+                except Exception:
+                    pass
         else:
             self.close_all()
 
@@ -353,14 +575,15 @@ class TDXConnectionPool:
             for server in self.servers:
                 ip = server["ip"]
                 status = self._server_status.get(ip, {})
-                pool = self._pools.get(ip)
                 servers_status.append({
                     "name": server.get("name", ip),
                     "ip": ip,
                     "port": server["port"],
                     "status": status.get("status", ServerStatus.UNKNOWN),
                     "fail_count": status.get("fail_count", 0),
-                    "pool_size": pool.qsize() if pool else 0,
+                    "pool_size": self._idle_count(ip),
+                    "in_use": self._in_use.get(ip, 0),
+                    "latency_ms": round(self._latency[ip], 1) if ip in self._latency else None,
                     "is_current": ip == current["ip"]
                 })
 
@@ -372,6 +595,8 @@ class TDXConnectionPool:
                 },
                 "max_connections_per_server": self.max_connections,
                 "retry_times": self.retry_times,
+                "idle": sum(len(pool) for pool in self._pools.values()),
+                "in_use": sum(self._in_use.values()),
                 "servers": servers_status
             }
 
@@ -384,6 +609,9 @@ tdx_connection_pool = TDXConnectionPool(
     retry_times=3,
     health_check_interval=60,
     unhealthy_threshold=3,
-    recovery_time=300
+    recovery_time=300,
+    load_balance={"1": "wrr", "true": "wrr", "yes": "wrr", "wrr": "wrr", "least": "least"}.get(
+        os.getenv("TDX_LOAD_BALANCE", "").lower()
+    )
 )
 
@@ -1,5 +1,10 @@
 """服务模块"""
 from .cache import CacheService
+from .executor import executor, run_blocking, executor_stats, ExecutorOverloaded
+from .response_cache import response_cache, cached, cached_response, single_flight
 
-__all__ = ["CacheService"]
+__all__ = [
+    "CacheService", "executor", "run_blocking", "executor_stats", "ExecutorOverloaded",
+    "response_cache", "cached", "cached_response", "single_flight",
+]
 
@@ -1,9 +1,29 @@
 """缓存服务"""
 import os
 import json
+import time
 from datetime import datetime
 from typing import Any, Optional
 
+try:
+    import orjson
+except ImportError:  # 未安装 orjson 时回退到标准库 json
+    orjson = None
+
+
+def _dumps(obj: Any) -> bytes:
+    """序列化为UTF-8 JSON字节"""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False).encode("utf-8")
+
+
+def _loads(raw: bytes) -> Any:
+    """解析JSON字节"""
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
 
 class CacheService:
     """缓存服务，管理文件缓存"""
@@ -18,13 +38,13 @@ class CacheService:
         except Exception:
             pass
     
-    def load_cache(self, name: str, max_age: int = 86400) -> Optional[Any]:
+    def load_cache(self, name: str, max_age: Optional[int] = 86400) -> Optional[Any]:
         """
         加载缓存数据
         
         Args:
             name: 缓存文件名
-            max_age: 最大缓存年龄（秒），默认24小时
+            max_age: 最大缓存年龄（秒），默认24小时；None 表示只按写入时的 expires_at 判断
         
         Returns:
             缓存数据，如果缓存不存在或过期则返回None
@@ -34,12 +54,17 @@ class CacheService:
             p = os.path.join(self.cache_dir, name)
             if not os.path.exists(p):
                 return None
-            with open(p, "r", encoding="utf-8") as f:
-                obj = json.load(f)
+            with open(p, "rb") as f:
+                obj = _loads(f.read())
             ts = obj.get("cached_at")
             data = obj.get("data")
             if not ts or data is None:
                 return None
+            expires_at = obj.get("expires_at")
+            if expires_at is not None and time.time() > expires_at:
+                return None
+            if max_age is None:
+                return data
             try:
                 t0 = datetime.fromisoformat(ts)
                 if (datetime.now() - t0).total_seconds() > max_age:
@@ -50,13 +75,14 @@ class CacheService:
         except Exception:
             return None
     
-    def save_cache(self, name: str, data: Any) -> bool:
+    def save_cache(self, name: str, data: Any, ttl: Optional[float] = None) -> bool:
         """
         保存缓存数据
         
         Args:
             name: 缓存文件名
             data: 要缓存的数据
+            ttl: 有效期（秒），设置后加载时按绝对过期时间判断
         
         Returns:
             是否保存成功
@@ -64,11 +90,14 @@ class CacheService:
         try:
             self.ensure_cache_dir()
             p = os.path.join(self.cache_dir, name)
-            with open(p, "w", encoding="utf-8") as f:
-                json.dump({
-                    "cached_at": datetime.now().isoformat(),
-                    "data": data
-                }, f, ensure_ascii=False)
+            obj = {
+                "cached_at": datetime.now().isoformat(),
+                "data": data
+            }
+            if ttl is not None:
+                obj["expires_at"] = time.time() + ttl
+            with open(p, "wb") as f:
+                f.write(_dumps(obj))
             return True
         except Exception:
             return False
@@ -0,0 +1,106 @@
+"""磁盘响应缓存：历史K线、财务、除权除息等收盘后基本不变的数据，重启后直接从磁盘读取"""
+import os
+import re
+from datetime import datetime, timedelta
+from typing import Any, Optional, Tuple
+
+from config import DISK_CACHE_TTL
+from .cache import CacheService
+
+_CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "cache", "responses")
+_store = CacheService(_CACHE_DIR)
+
+# 分钟/小时级K线周期，其余为日线及以上；与 config.PERIOD_CONFIG 一致(7 为年线)
+_INTRADAY_PERIODS = {0, 1, 2, 3, 8}
+# 缓存文件数上限，文件名包含代码/周期/条数，不同请求各占一个文件；超过上限时按修改时间淘汰最旧的
+_MAX_FILES = 5000
+# 每写入多少次检查一次文件数，避免每次写入都列目录
+_EVICT_EVERY = 100
+_saves_since_evict = 0
+_UNSAFE_CHARS = re.compile(r"[^0-9A-Za-z_.-]")
+
+
+def _seconds_until_next_open(now: datetime) -> float:
+    """交易时段内返回盘中缓存时间，否则缓存到下一个开盘时间(09:15)"""
+    intraday = DISK_CACHE_TTL["bars_intraday"]
+    if now.weekday() < 5 and (9, 15) <= (now.hour, now.minute) < (15, 5):
+        return intraday
+    next_open = now.replace(hour=9, minute=15, second=0, microsecond=0)
+    if now >= next_open:
+        next_open += timedelta(days=1)
+    while next_open.weekday() >= 5:
+        next_open += timedelta(days=1)
+    return max((next_open - now).total_seconds(), intraday)
+
+
+def disk_ttl(key: Tuple) -> Optional[float]:
+    """缓存键对应的磁盘缓存时间，不落盘的数据返回None"""
+    kind = key[0]
+    if kind == "bars":
+        period = key[2]
+        if period in _INTRADAY_PERIODS:
+            return DISK_CACHE_TTL["bars_intraday"]
+        return _seconds_until_next_open(datetime.now())
+    return DISK_CACHE_TTL.get(kind)
+
+
+def _file_name(key: Tuple) -> str:
+    return _UNSAFE_CHARS.sub("_", "_".join(str(k) for k in key)) + ".json"
+
+
+def load(key: Tuple) -> Optional[Any]:
+    """读取磁盘缓存；文件存在但已过期或损坏时顺带删除"""
+    name = _file_name(key)
+    # 过期时间完全由写入时的 ttl(expires_at) 决定，不受 load_cache 默认24小时上限截断
+    value = _store.load_cache(name, max_age=None)
+    if value is None:
+        try:
+            os.remove(os.path.join(_CACHE_DIR, name))
+        except OSError:
+            pass
+    return value
+
+
+def save(key: Tuple, value: Any, ttl: float) -> bool:
+    global _saves_since_evict
+    ok = _store.save_cache(_file_name(key), value, ttl=ttl)
+    _saves_since_evict += 1
+    if _saves_since_evict >= _EVICT_EVERY:
+        _saves_since_evict = 0
+        _evict()
+    return ok
+
+
+def _evict(max_files: int = _MAX_FILES) -> int:
+    """文件数超过 max_files 时删除修改时间最早的文件，返回删除数量"""
+    try:
+        entries = [(e.stat().st_mtime, e.path) for e in os.scandir(_CACHE_DIR) if e.name.endswith(".json")]
+    except OSError:
+        return 0
+    excess = len(entries) - max_files
+    if excess <= 0:
+        return 0
+    n = 0
+    for _, path in sorted(entries)[:excess]:
+        try:
+            os.remove(path)
+            n += 1
+        except OSError:
+            pass
+    return n
+
+
+def clear() -> int:
+    """删除全部磁盘响应缓存文件，返回删除数量"""
+    n = 0
+    try:
+        for name in os.listdir(_CACHE_DIR):
+            if name.endswith(".json"):
+                try:
+                    os.remove(os.path.join(_CACHE_DIR, name))
+                    n += 1
+                except OSError:
+                    pass
+    except OSError:
+        pass
+    return n
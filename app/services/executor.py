@@ -0,0 +1,59 @@
+"""共享线程池，用于在事件循环外执行阻塞的TDX调用"""
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from config import API_CONFIG
+
+# 所有API路由与MCP工具共用同一个线程池，避免各模块各自创建线程
+executor = ThreadPoolExecutor(
+    max_workers=API_CONFIG["max_workers"],
+    thread_name_prefix="tdx-worker"
+)
+
+# 已提交且尚未完成的任务数；在工作线程的完成回调中减少，因此加锁
+_in_use = 0
+_in_use_lock = threading.Lock()
+# 在途任务上限，突发的大批量请求超过上限时直接拒绝，而不是无限排队
+MAX_PENDING = API_CONFIG["max_pending"] or 2 * API_CONFIG["max_workers"]
+# 达到上限时再等待一次的时间(秒)，给即将完成的任务让出位置
+_OVERLOAD_GRACE = 0.05
+
+
+class ExecutorOverloaded(Exception):
+    """线程池在途任务已满"""
+
+
+async def run_blocking(func, *args):
+    """在共享线程池中执行阻塞函数并等待结果；在途任务已满时抛出 ExecutorOverloaded"""
+    global _in_use
+    if _in_use >= MAX_PENDING:
+        await asyncio.sleep(_OVERLOAD_GRACE)
+        if _in_use >= MAX_PENDING:
+            raise ExecutorOverloaded(f"线程池繁忙: {_in_use} 个任务在途")
+    # 不使用 asyncio.to_thread + set_default_executor：事件循环关闭时会一并
+    # shutdown 默认执行器，导致这个模块级线程池在后续事件循环中不可用
+    with _in_use_lock:
+        _in_use += 1
+    future = executor.submit(func, *args)
+    # 在线程池任务真正结束(或未开始即被取消)时才减少计数；等待方被取消时工作线程仍在运行，
+    # 不能提前减少，否则在途数偏低，MAX_PENDING 检查会放入过多任务
+    future.add_done_callback(_release)
+    return await asyncio.wrap_future(future)
+
+
+def _release(_future):
+    global _in_use
+    with _in_use_lock:
+        _in_use -= 1
+
+
+def executor_stats() -> dict:
+    """线程池使用情况；in_use 超过 max_workers 的部分正在排队等待线程"""
+    max_workers = executor._max_workers
+    return {
+        "max_workers": max_workers,
+        "max_pending": MAX_PENDING,
+        "in_use": _in_use,
+        "available": max(0, max_workers - _in_use),
+    }
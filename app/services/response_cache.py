@@ -0,0 +1,234 @@
+"""接口响应缓存，命中时直接返回，不占用线程池"""
+import asyncio
+import gzip
+import hashlib
+import time
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
+
+import orjson
+from fastapi import Request, Response
+
+from config import RESPONSE_CACHE_TTL
+from .executor import run_blocking
+from . import disk_cache
+
+
+class TTLCache:
+    """带过期时间的内存缓存，仅在事件循环线程中访问，无需加锁"""
+
+    def __init__(self, max_size: int = 4096):
+        self.max_size = max_size
+        self._data: Dict[Hashable, Tuple[float, Any]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        item = self._data.get(key)
+        if item is not None:
+            if item[0] > time.monotonic():
+                self.hits += 1
+                return item[1]
+            del self._data[key]
+        self.misses += 1
+        return None
+
+    def set(self, key: Hashable, value: Any, ttl: float):
+        if key not in self._data and len(self._data) >= self.max_size:
+            self._evict()
+        self._data[key] = (time.monotonic() + ttl, value)
+
+    def _evict(self):
+        """先清理过期条目，仍然满时淘汰最早写入的条目"""
+        now = time.monotonic()
+        for k in [k for k, (exp, _) in self._data.items() if exp <= now]:
+            del self._data[k]
+        while len(self._data) >= self.max_size:
+            del self._data[next(iter(self._data))]
+
+    def clear(self) -> int:
+        n = len(self._data)
+        self._data.clear()
+        return n
+
+    def stats(self) -> Dict[str, int]:
+        return {"size": len(self._data), "hits": self.hits, "misses": self.misses}
+
+
+response_cache = TTLCache()
+
+# 响应体小于该字节数时不值得压缩
+GZIP_MIN_SIZE = 1024
+
+# 正在执行的请求: key -> Future，相同参数的并发请求共用一次上游调用
+_inflight: Dict[Hashable, asyncio.Future] = {}
+
+
+async def single_flight(key: Hashable, func, *args):
+    """相同 key 的并发调用只执行一次，其余调用等待同一结果；func 为协程函数时直接 await，否则在线程池中执行"""
+    fut = _inflight.get(key)
+    if fut is None:
+        if asyncio.iscoroutinefunction(func):
+            fut = asyncio.ensure_future(func(*args))
+        else:
+            fut = asyncio.ensure_future(run_blocking(func, *args))
+        _inflight[key] = fut
+
+        def _done(f):
+            _inflight.pop(key, None)
+            # 等待者都已取消时，读取异常以免产生 "exception was never retrieved" 警告
+            if not f.cancelled():
+                f.exception()
+
+        fut.add_done_callback(_done)
+    # shield: 单个请求被取消时不影响其他等待同一结果的请求
+    return await asyncio.shield(fut)
+
+
+def _load_or_fetch(key: Tuple, ttl: float, func, *args):
+    """先查磁盘缓存，未命中再调用 func 并写回磁盘（在线程池中执行）"""
+    value = disk_cache.load(key)
+    if value is not None:
+        return value
+    value = func(*args)
+    if value:
+        disk_cache.save(key, value, ttl)
+    return value
+
+
+async def cached(key: Tuple, func, *args):
+    """
+    带缓存地执行阻塞函数，内存缓存未命中时再查磁盘缓存(若该类数据配置了磁盘缓存)
+
+    Args:
+        key: 缓存键，首元素为数据类型，对应 RESPONSE_CACHE_TTL 中的过期时间
+        func: 阻塞函数，未命中时在线程池中执行
+    """
+    value = response_cache.get(key)
+    if value is not None:
+        return value
+    ttl = disk_cache.disk_ttl(key)
+    if ttl is not None:
+        value = await single_flight(key, _load_or_fetch, key, ttl, func, *args)
+    else:
+        value = await single_flight(key, func, *args)
+    # 失败或空结果不缓存，下次请求重新获取
+    if value:
+        response_cache.set(key, value, RESPONSE_CACHE_TTL.get(key[0], 1))
+    return value
+
+
+def quote_key(symbol: str) -> Tuple:
+    """实时行情的缓存键；REST 与 MCP 接口都使用它，才能共享同一缓存条目"""
+    return ("quote", symbol.lower())
+
+
+def _load_many(keys: List[Tuple]) -> Dict[Tuple, Any]:
+    """批量读取磁盘缓存（在线程池中执行），返回命中的 {缓存键: 数据}"""
+    hits = {}
+    for key in keys:
+        value = disk_cache.load(key)
+        if value is not None:
+            hits[key] = value
+    return hits
+
+
+def _save_many(entries: List[Tuple[Tuple, Any, float]]):
+    """批量写入磁盘缓存（在线程池中执行）"""
+    for key, value, ttl in entries:
+        disk_cache.save(key, value, ttl)
+
+
+async def cached_many(items: List[str], key_of: Callable[[str], Tuple], fetch, *args) -> Dict[str, Any]:
+    """
+    批量查询的部分缓存：逐项查内存缓存，再查磁盘缓存(与 cached 相同的规则)，只把都未命中的项交给上游
+
+    Args:
+        items: 待查询的项(如股票代码)
+        key_of: 项 -> 缓存键，与单项接口使用同一键即可共享缓存
+        fetch: fetch(misses, *args)，返回 {项: 结果}，失败返回 None；可为阻塞函数或协程函数
+
+    Returns:
+        {项: 结果}，按 items 顺序；上游返回了结果的项即使为空也包含在内(空结果不缓存)，
+        获取失败的项不包含在内
+    """
+    found: Dict[str, Any] = {}
+    misses = []
+    for item in items:
+        value = response_cache.get(key_of(item))
+        if value is None:
+            misses.append(item)
+        else:
+            found[item] = value
+    disk_misses = [item for item in misses if disk_cache.disk_ttl(key_of(item)) is not None]
+    if disk_misses:
+        hits = await run_blocking(_load_many, [key_of(item) for item in disk_misses])
+        for item in disk_misses:
+            key = key_of(item)
+            value = hits.get(key)
+            if value is not None:
+                response_cache.set(key, value, RESPONSE_CACHE_TTL.get(key[0], 1))
+                found[item] = value
+        misses = [item for item in misses if item not in found]
+    if misses:
+        # 未命中集合相同的并发请求只请求一次上游
+        flight_key = ("many",) + tuple(key_of(item) for item in misses)
+        fresh = await single_flight(flight_key, fetch, misses, *args) or {}
+        to_disk = []
+        for item in misses:
+            if item not in fresh:
+                continue
+            value = fresh[item]
+            found[item] = value
+            if value:
+                key = key_of(item)
+                response_cache.set(key, value, RESPONSE_CACHE_TTL.get(key[0], 1))
+                ttl = disk_cache.disk_ttl(key)
+                if ttl is not None:
+                    to_disk.append((key, value, ttl))
+        if to_disk:
+            await run_blocking(_save_many, to_disk)
+    return {item: found[item] for item in items if item in found}
+
+
+def _encode_body(payload: Any) -> Tuple[bytes, str, Optional[bytes]]:
+    """序列化响应数据，返回 (响应体, ETag, gzip压缩体)；小响应不压缩"""
+    body = orjson.dumps(payload, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+    etag = hashlib.blake2b(body, digest_size=12).hexdigest()
+    gz = gzip.compress(body, compresslevel=6) if len(body) >= GZIP_MIN_SIZE else None
+    return body, etag, gz
+
+
+async def cached_response(key: Tuple, build: Callable[[], Awaitable[Tuple[Any, bool]]],
+                          request: Optional[Request] = None) -> Response:
+    """
+    缓存序列化后的JSON响应体，命中时直接返回字节，省去每次请求的序列化和压缩开销
+
+    Args:
+        key: 缓存键，规则同 cached，响应体以 key + ("body",) 单独缓存
+        build: 协程函数，返回 (响应数据, 是否可缓存)
+        request: 传入时(GET接口)附带 ETag/Cache-Control，If-None-Match 匹配时返回304；
+            客户端支持 gzip 时直接返回预先压缩好的响应体
+    """
+    body_key = key + ("body",)
+    ttl = RESPONSE_CACHE_TTL.get(key[0], 1)
+    item = response_cache.get(body_key)
+    if item is None:
+        payload, cacheable = await build()
+        # 板块/行业等大响应序列化和压缩耗时较长，放到线程池中执行
+        item = await run_blocking(_encode_body, payload)
+        if cacheable:
+            response_cache.set(body_key, item, ttl)
+    body, etag, gz = item
+    if request is None:
+        return Response(content=body, media_type="application/json")
+    # 同一内容的不同编码使用不同的强 ETag
+    if gz is not None and "gzip" in request.headers.get("accept-encoding", ""):
+        headers = {"ETag": f'"{etag}-gz"', "Content-Encoding": "gzip"}
+        body = gz
+    else:
+        headers = {"ETag": f'"{etag}"'}
+    headers["Cache-Control"] = f"public, max-age={int(ttl)}"
+    headers["Vary"] = "Accept-Encoding"
+    if request.headers.get("if-none-match") == headers["ETag"]:
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
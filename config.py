@@ -1,6 +1,7 @@
 """
 TDX数据服务配置
 """
+import os
 
 # 服务器配置
 TDX_SERVERS = [
@@ -11,7 +12,14 @@ TDX_SERVERS = [
 
 # API配置
 API_CONFIG = {
-    "max_workers": 10,
+    # 阻塞调用线程数：线程大部分时间阻塞在TDX网络往返上，不按CPU核数计算，可通过环境变量覆盖
+    "max_workers": int(os.getenv("TDX_MAX_WORKERS", 32)),
+    # FastAPI/anyio 共用线程池的并发上限(启动预加载、同步依赖等)，anyio 默认为40
+    "threadpool_tokens": int(os.getenv("TDX_THREADPOOL_TOKENS", 40)),
+    # 线程池最多允许的在途任务数(执行中+排队)，超过时接口返回503，0 表示默认的 2*max_workers
+    "max_pending": int(os.getenv("TDX_MAX_PENDING", 0)),
+    # 实时行情走 asyncio 直连，不占用线程池；设为 0 时全部退回线程池中的 pytdx
+    "async_quotes": os.getenv("TDX_ASYNC_QUOTES", "1") != "0",
     "request_timeout": 30,
     "max_batch_size": 100,
     "max_history_bars": 1000
@@ -37,4 +45,20 @@ PERIOD_CONFIG = {
     8: "1分钟",
     9: "日线",
     10: "季度线"
-}
\ No newline at end of file
+}
+# 接口响应缓存时间(秒)，按数据类型区分
+RESPONSE_CACHE_TTL = {
+    "quote": 1,
+    "bars": 60,
+    "finance": 3600,
+    "xdxr": 3600,
+    "blocks": 6 * 3600,
+    "industries": 6 * 3600,
+}
+
+# 磁盘响应缓存时间(秒)，重启后仍然有效；日线及以上K线的过期时间按交易时段计算
+DISK_CACHE_TTL = {
+    "finance": 86400,
+    "xdxr": 86400,
+    "bars_intraday": 300,
+}
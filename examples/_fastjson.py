@@ -0,0 +1,15 @@
+"""
+示例与测试脚本共用的 JSON 编解码
+装有 orjson 时使用 orjson，否则退回标准库 json；json_dumps 统一返回 bytes
+"""
+
+try:
+    import orjson
+    json_loads = orjson.loads
+    json_dumps = orjson.dumps
+except ImportError:
+    import json
+    json_loads = json.loads
+
+    def json_dumps(obj) -> bytes:
+        return json.dumps(obj).encode()
@@ -0,0 +1,121 @@
+"""
+示例共用的 HTTP MCP 客户端
+通过服务的 REST 接口调用与 MCP 工具同名的功能
+"""
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from typing import Any, Dict, Tuple
+
+from _fastjson import json_loads as _json_loads
+
+class _ToolRoutes:
+    """工具名到 REST 请求 (method, url, kwargs) 的映射"""
+
+    def __init__(self, base_url: str = "http://localhost:6999/mcp", timeout: int = 15):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self._dispatch = {
+            "get_quote": self._get_quote,
+            "get_quotes": self._get_quotes,
+            "get_history": self._get_history,
+            "get_history_batch": self._get_history_batch,
+            "get_finance": self._get_finance,
+            "get_stock_info": self._get_stock_info,
+            "get_blocks": self._get_blocks,
+            "get_industries": self._get_industries,
+        }
+        # 构造时一次性算好REST根地址和各接口的固定前缀，调用时只拼接变量部分
+        self.api_base = self.base_url[:-4] if self.base_url.endswith("/mcp") else self.base_url
+        self._url_quote = f"{self.api_base}/api/quote/"
+        self._url_quotes = f"{self.api_base}/api/quotes"
+        self._url_history = f"{self.api_base}/api/history/"
+        self._url_history_batch = f"{self.api_base}/api/history/batch"
+        self._url_finance = f"{self.api_base}/api/finance/"
+        self._url_stock = f"{self.api_base}/api/stock/"
+        self._url_blocks = f"{self.api_base}/api/blocks"
+        self._url_industries = f"{self.api_base}/api/industries"
+
+    def _build_request(self, name: str, args: Dict[str, Any]) -> Tuple[str, str, Dict[str, Any]]:
+        builder = self._dispatch.get(name)
+        if builder is None:
+            raise ValueError("unknown tool")
+        return builder(args)
+
+    def _get_quote(self, args: Dict[str, Any]):
+        return "GET", self._url_quote + args['symbol'], {}
+
+    def _get_quotes(self, args: Dict[str, Any]):
+        return "POST", self._url_quotes, {"json": args.get("symbols", [])}
+
+    def _get_history(self, args: Dict[str, Any]):
+        params = {"period": int(args.get("period", 9)), "count": int(args.get("count", 50))}
+        return "GET", self._url_history + args['symbol'], {"params": params}
+
+    def _get_history_batch(self, args: Dict[str, Any]):
+        payload = {
+            "symbols": args.get("symbols", []),
+            "period": int(args.get("period", 9)),
+            "count": int(args.get("count", 50)),
+        }
+        if "batch_size" in args:
+            payload["batch_size"] = int(args["batch_size"])
+        return "POST", self._url_history_batch, {"json": payload}
+
+    def _get_finance(self, args: Dict[str, Any]):
+        return "GET", self._url_finance + args['symbol'], {}
+
+    def _get_stock_info(self, args: Dict[str, Any]):
+        return "GET", self._url_stock + args['symbol'], {}
+
+    def _get_blocks(self, args: Dict[str, Any]):
+        return "GET", self._url_blocks, {}
+
+    def _get_industries(self, args: Dict[str, Any]):
+        return "GET", self._url_industries, {}
+
+class HTTPMCPClient(_ToolRoutes):
+    """同步客户端，基于带连接池的 requests.Session"""
+
+    def __init__(self, base_url: str = "http://localhost:6999/mcp", timeout: int = 15,
+                 pool_connections: int = 16, pool_maxsize: int = 32):
+        super().__init__(base_url, timeout)
+        self.session = requests.Session()
+        self.session.mount("http://", HTTPAdapter(
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+            max_retries=Retry(total=2, backoff_factor=0.1)
+        ))
+
+    def call_tool(self, name: str, args: Dict[str, Any]) -> Any:
+        method, url, kwargs = self._build_request(name, args)
+        r = self.session.request(method, url, timeout=self.timeout, **kwargs)
+        return _json_loads(r.content)
+
+class AsyncHTTPMCPClient(_ToolRoutes):
+    """异步客户端，基于 httpx.AsyncClient，可用 asyncio.gather 并发调用多个工具"""
+
+    def __init__(self, base_url: str = "http://localhost:6999/mcp", timeout: int = 15,
+                 max_connections: int = 32):
+        import httpx
+        super().__init__(base_url, timeout)
+        self.client = httpx.AsyncClient(
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            transport=httpx.AsyncHTTPTransport(retries=2),
+        )
+
+    async def call_tool(self, name: str, args: Dict[str, Any]) -> Any:
+        method, url, kwargs = self._build_request(name, args)
+        r = await self.client.request(method, url, **kwargs)
+        return _json_loads(r.content)
+
+    async def aclose(self):
+        await self.client.aclose()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.aclose()
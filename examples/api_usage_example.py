@@ -4,14 +4,28 @@ TDX数据服务API使用示例
 演示如何使用所有API端点进行数据获取和分析
 """
 
+import asyncio
 import requests
-import json
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import numpy as np
 import pandas as pd
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional
 import time
 
+from _fastjson import json_loads as _json_loads
+
 BASE_URL = "http://localhost:6999"
 
+# 复用连接的HTTP会话（keep-alive + 连接池）
+_SESSION = requests.Session()
+_SESSION.mount("http://", HTTPAdapter(
+    pool_connections=16,
+    pool_maxsize=32,
+    max_retries=Retry(total=2, backoff_factor=0.1)
+))
+
 def print_section(title):
     """打印章节标题"""
     print(f"\n{'='*60}")
@@ -22,9 +36,9 @@ def get_api_data(endpoint: str, params: Dict = None) -> Dict:
     """通用API数据获取函数"""
     try:
         if params:
-            response = requests.get(f"{BASE_URL}{endpoint}", params=params)
+            response = _SESSION.get(f"{BASE_URL}{endpoint}", params=params)
         else:
-            response = requests.get(f"{BASE_URL}{endpoint}")
+            response = _SESSION.get(f"{BASE_URL}{endpoint}")
         
         # 检查HTTP状态码
         if response.status_code != 200:
@@ -32,7 +46,7 @@ def get_api_data(endpoint: str, params: Dict = None) -> Dict:
             print(f"获取 {endpoint} 数据失败: HTTP {response.status_code} - {error_detail}")
             return {}
             
-        data = response.json()
+        data = _json_loads(response.content)
         return data
     except Exception as e:
         print(f"获取 {endpoint} 数据失败: {e}")
@@ -41,10 +55,9 @@ def get_api_data(endpoint: str, params: Dict = None) -> Dict:
 def post_api_data(endpoint: str, data: Any) -> Dict:
     """通用API数据提交函数"""
     try:
-        response = requests.post(
+        response = _SESSION.post(
             f"{BASE_URL}{endpoint}",
-            headers={"Content-Type": "application/json"},
-            data=json.dumps(data)
+            json=data
         )
         
         # 检查HTTP状态码
@@ -53,7 +66,7 @@ def post_api_data(endpoint: str, data: Any) -> Dict:
             print(f"提交 {endpoint} 数据失败: HTTP {response.status_code} - {error_detail}")
             return {}
             
-        data = response.json()
+        data = _json_loads(response.content)
         return data
     except Exception as e:
         print(f"提交 {endpoint} 数据失败: {e}")
@@ -179,31 +192,91 @@ def example_corporate_actions():
             print(f"    流通股前: {record.get('liquidity_before', 0):,.0f}")
             print(f"    流通股后: {record.get('liquidity_after', 0):,.0f}")
 
-def example_advanced_usage():
-    """高级使用示例"""
+async def _concurrent_quotes(symbols: List[str], concurrency: int) -> List[tuple]:
+    """在一个事件循环中并发请求行情，信号量限制同时在途的请求数，返回 [(symbol, 成功, 耗时毫秒)]"""
+    import httpx
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    sem = asyncio.Semaphore(concurrency)
+
+    # 完整地址在发请求前一次性算好，不在计时区间内拼接
+    url_prefix = f"{BASE_URL}/api/quote/"
+
+    async with httpx.AsyncClient(timeout=10, limits=limits) as client:
+        get = client.get
+
+        async def one(symbol, url):
+            async with sem:
+                start = time.perf_counter()
+                try:
+                    r = await get(url)
+                    ok = r.status_code == 200 and bool(_json_loads(r.content).get('quote'))
+                except httpx.HTTPError:
+                    ok = False
+                return symbol, ok, (time.perf_counter() - start) * 1000
+
+        return await asyncio.gather(*(one(s, url_prefix + s) for s in symbols))
+
+def _threaded_quotes(symbols: List[str], concurrency: int) -> List[tuple]:
+    """
+    未安装 httpx 时的后备：每个请求是一个独立任务，由 concurrency 个线程从同一队列中领取，
+    通过共享 Session 的连接池发送；任一线程空闲即取下一个请求，不按线程预先分配
+    """
+    # 地址前缀和绑定方法在循环外取好，计时只包含请求本身
+    url_prefix = f"{BASE_URL}/api/quote/"
+    get = _SESSION.get
+
+    def one(symbol):
+        start = time.perf_counter()
+        try:
+            r = get(url_prefix + symbol, timeout=10)
+            ok = r.status_code == 200 and bool(_json_loads(r.content).get('quote'))
+        except requests.RequestException:
+            ok = False
+        return symbol, ok, (time.perf_counter() - start) * 1000
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        return list(pool.map(one, symbols))
+
+def example_advanced_usage(rounds: int = 4, concurrency: int = 8, raw_samples_path: Optional[str] = None):
+    """
+    高级使用示例
+
+    Args:
+        raw_samples_path: 需要保留每个请求的耗时时写入该 .npy 文件，默认只输出汇总统计
+    """
     print_section("6. 高级使用示例")
     
     # 连接池性能测试
     print("测试连接池并发性能:")
     
-    symbols = ["sh600000", "sz000001", "sh601398", "sz000002", "sh601318"]
+    symbols = ["sh600000", "sz000001", "sh601398", "sz000002", "sh601318"] * rounds
     
-    start_time = time.time()
+    start_time = time.perf_counter()
+    try:
+        results = asyncio.run(_concurrent_quotes(symbols, concurrency))
+    except ImportError:
+        results = _threaded_quotes(symbols, concurrency)
+    end_time = time.perf_counter()
     
-    results = []
-    for symbol in symbols:
-        quote = get_api_data(f"/api/quote/{symbol}")
-        if quote.get('quote'):
-            results.append(True)
-            print(f"  {symbol}: ✓")
-        else:
-            results.append(False)
-            print(f"  {symbol}: ✗")
+    for symbol, ok, ms in results[:5]:
+        print(f"  {symbol}: {'✓' if ok else '✗'} ({ms:.1f}ms)")
     
-    end_time = time.time()
+    elapsed = end_time - start_time
+    success = sum(ok for _, ok, _ in results)
+    print(f"并发请求完成时间: {elapsed:.2f} 秒 (共 {len(results)} 个请求, 并发 {concurrency})")
+    print(f"吞吐量: {len(results) / elapsed:.1f} 请求/秒")
+    print(f"成功率: {success}/{len(results)}")
     
-    print(f"并发请求完成时间: {end_time - start_time:.2f} 秒")
-    print(f"成功率: {sum(results)}/{len(results)}")
+    # 耗时统计一次转为数组，分位数一次计算
+    rt = np.asarray([ms for _, ok, ms in results if ok], dtype=np.float64)
+    if raw_samples_path and rt.size:
+        np.save(raw_samples_path, rt)
+        print(f"原始耗时样本已保存: {raw_samples_path} ({rt.size} 条)")
+    if rt.size:
+        p50, p95, p99 = np.percentile(rt, (50, 95, 99))
+        std = rt.std(ddof=1) if rt.size > 1 else 0.0
+        print(f"耗时(ms): 最小 {rt.min():.1f} / 平均 {rt.mean():.1f} / 中位 {p50:.1f} / "
+              f"p95 {p95:.1f} / p99 {p99:.1f} / 最大 {rt.max():.1f} / 标准差 {std:.1f}")
 
 def main():
     """主函数"""
@@ -212,19 +285,10 @@ def main():
     
     try:
         example_basic_usage()
-        time.sleep(1)
-        
         example_real_time_data()
-        time.sleep(1)
-        
         example_history_data()
-        time.sleep(1)
-        
         example_sector_industry_data()
-        time.sleep(1)
-        
         example_corporate_actions()
-        time.sleep(1)
         
         example_advanced_usage()
         
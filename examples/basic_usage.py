@@ -5,21 +5,22 @@ TDX数据服务基础使用示例
 """
 
 import requests
-import json
 import pandas as pd
 from datetime import datetime
 
 class TDXClientExample:
     def __init__(self, base_url="http://localhost:6999"):
         self.base_url = base_url
+        # 复用连接的HTTP会话，各示例请求共用 keep-alive 连接
+        self.session = requests.Session()
     
     def get_service_info(self):
         """获取服务信息"""
         print("=== 服务信息 ===")
-        response = requests.get(f"{self.base_url}/")
+        response = self.session.get(f"{self.base_url}/")
         print(f"服务版本: {response.json()['version']}")
         
-        response = requests.get(f"{self.base_url}/api/status")
+        response = self.session.get(f"{self.base_url}/api/status")
         status = response.json()
         print(f"连接状态: {status['connected']}")
         print(f"当前时间: {status['timestamp']}")
@@ -27,7 +28,7 @@ class TDXClientExample:
     def list_servers(self):
         """列出可用服务器"""
         print("\n=== 可用服务器 ===")
-        response = requests.get(f"{self.base_url}/api/servers")
+        response = self.session.get(f"{self.base_url}/api/servers")
         servers = response.json()['servers']
         
         for i, server in enumerate(servers):
@@ -36,7 +37,7 @@ class TDXClientExample:
     def get_single_quote(self, symbol):
         """获取单个股票行情"""
         print(f"\n=== {symbol} 实时行情 ===")
-        response = requests.get(f"{self.base_url}/api/quote/{symbol}")
+        response = self.session.get(f"{self.base_url}/api/quote/{symbol}")
         
         if response.status_code != 200:
             print(f"获取行情失败: {response.json().get('detail', '未知错误')}")
@@ -66,10 +67,9 @@ class TDXClientExample:
     def get_batch_quotes(self, symbols):
         """批量获取行情"""
         print(f"\n=== 批量行情查询 ===")
-        response = requests.post(
+        response = self.session.post(
             f"{self.base_url}/api/quotes",
-            headers={"Content-Type": "application/json"},
-            data=json.dumps(symbols)
+            json=symbols
         )
         
         quotes = response.json()['quotes']
@@ -93,7 +93,7 @@ class TDXClientExample:
     def get_history_data(self, symbol, period=9, count=20):
         """获取历史K线数据"""
         print(f"\n=== {symbol} 历史数据 ===")
-        response = requests.get(f"{self.base_url}/api/history/{symbol}?period={period}&count={count}")
+        response = self.session.get(f"{self.base_url}/api/history/{symbol}?period={period}&count={count}")
         data = response.json()
         
         print(f"数据周期: {data['period']}")
@@ -110,7 +110,7 @@ class TDXClientExample:
     def get_finance_info(self, symbol):
         """获取财务信息"""
         print(f"\n=== {symbol} 财务信息 ===")
-        response = requests.get(f"{self.base_url}/api/finance/{symbol}")
+        response = self.session.get(f"{self.base_url}/api/finance/{symbol}")
         
         if response.status_code != 200:
             print(f"获取财务信息失败: {response.json().get('detail', '未知错误')}")
@@ -135,7 +135,7 @@ class TDXClientExample:
     def get_stock_info(self, symbol):
         """获取股票基本信息"""
         print(f"\n=== {symbol} 基本信息 ===")
-        response = requests.get(f"{self.base_url}/api/stock/{symbol}")
+        response = self.session.get(f"{self.base_url}/api/stock/{symbol}")
         data = response.json()
         
         info = data['info']
@@ -4,48 +4,115 @@ TDX数据服务数据分析示例
 演示如何使用API数据进行简单的金融分析
 """
 
+import os
+import sys
 import requests
-import json
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import time
+import threading
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
-from typing import Dict, Any
-import matplotlib.pyplot as plt
+from typing import Dict, Any, List
+from collections import Counter
+import matplotlib
+matplotlib.use("Agg")  # 仅保存PNG，使用无界面后端
+from matplotlib.figure import Figure
 
 # 配置中文字体支持
-plt.rcParams['font.sans-serif'] = ['Microsoft YaHei', 'SimHei', 'DejaVu Sans']
-plt.rcParams['axes.unicode_minus'] = False  # 解决负号显示问题
+matplotlib.rcParams['font.sans-serif'] = ['Microsoft YaHei', 'SimHei', 'DejaVu Sans']
+matplotlib.rcParams['axes.unicode_minus'] = False  # 解决负号显示问题
+
+from _fastjson import json_loads as _json_loads
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import MARKET_CODES
 
 BASE_URL = "http://localhost:6999"
 
+# 复用连接的HTTP会话（keep-alive + 连接池）
+_SESSION = requests.Session()
+_SESSION.mount("http://", HTTPAdapter(
+    pool_connections=16,
+    pool_maxsize=32,
+    max_retries=Retry(total=2, backoff_factor=0.1)
+))
+
+# 变化缓慢的端点在客户端缓存，实时行情不缓存
+_CACHE_TTL = 600
+_CACHEABLE_PREFIXES = ("/api/blocks", "/api/industries", "/api/servers", "/api/finance/")
+_cache: Dict[tuple, tuple] = {}
+_cache_lock = threading.Lock()
+
 def get_api_data(endpoint: str, params: Dict = None) -> Dict:
     """通用API数据获取函数"""
+    cacheable = endpoint.startswith(_CACHEABLE_PREFIXES)
+    key = (endpoint, tuple(sorted(params.items())) if params else None)
+    if cacheable:
+        with _cache_lock:
+            hit = _cache.get(key)
+        if hit and time.monotonic() - hit[0] < _CACHE_TTL:
+            return hit[1]
     try:
         if params:
-            response = requests.get(f"{BASE_URL}{endpoint}", params=params)
+            response = _SESSION.get(f"{BASE_URL}{endpoint}", params=params)
         else:
-            response = requests.get(f"{BASE_URL}{endpoint}")
+            response = _SESSION.get(f"{BASE_URL}{endpoint}")
         
         response.raise_for_status()
-        return response.json()
+        data = _json_loads(response.content)
     except Exception as e:
         print(f"获取 {endpoint} 数据失败: {e}")
         return {}
+    if cacheable:
+        with _cache_lock:
+            _cache[key] = (time.monotonic(), data)
+    return data
 
 def post_api_data(endpoint: str, data: Any) -> Dict:
     """通用API数据提交函数"""
     try:
-        response = requests.post(
+        response = _SESSION.post(
             f"{BASE_URL}{endpoint}",
-            headers={"Content-Type": "application/json"},
-            data=json.dumps(data)
+            json=data
         )
         response.raise_for_status()
-        return response.json()
+        return _json_loads(response.content)
     except Exception as e:
         print(f"提交 {endpoint} 数据失败: {e}")
         return {}
 
+def _market_code(symbol: str):
+    """与服务端相同的代码解析：sh/sz/bj 前缀查 MARKET_CODES，无前缀时 6/9/5 开头为上海"""
+    market = MARKET_CODES.get(symbol[:2].lower())
+    if market is not None:
+        return market, symbol[2:]
+    return (1 if symbol[:1] in ("6", "9", "5") else 0), symbol
+
+# 单次运行内的行情缓存，多个分析共用的股票只请求一次
+_QUOTE_MEMO: Dict[str, Dict] = {}
+
+def fetch_quotes(symbols: List[str]) -> Dict[str, Dict]:
+    """通过批量接口一次获取多只股票的实时行情，返回 {symbol: quote}"""
+    missing = [s for s in symbols if s not in _QUOTE_MEMO]
+    if missing:
+        data = post_api_data("/api/quotes", missing)
+        by_key = {(q.get('market'), q.get('code')): q for q in data.get('quotes') or [] if q}
+        for s in missing:
+            q = by_key.get(_market_code(s))
+            if q:
+                _QUOTE_MEMO[s] = q
+    return {s: _QUOTE_MEMO[s] for s in symbols if s in _QUOTE_MEMO}
+
+def print_table(rows: List[Dict], columns: List[str]):
+    """以对齐的表格形式打印字典列表"""
+    cells = [[f"{v:.2f}" if isinstance(v, float) else str(v) for v in (r.get(c, '') for c in columns)] for r in rows]
+    widths = [max([len(c)] + [len(row[i]) for row in cells]) for i, c in enumerate(columns)]
+    print(" ".join(c.rjust(w) for c, w in zip(columns, widths)))
+    for row in cells:
+        print(" ".join(v.rjust(w) for v, w in zip(row, widths)))
+
 def analyze_stock_performance():
     """分析股票表现"""
     print("\n=== 股票表现分析 ===")
@@ -55,12 +122,13 @@ def analyze_stock_performance():
     
     performance_data = []
     
+    # 一次请求批量获取实时行情
+    quotes = fetch_quotes(bank_stocks)
+    
     for symbol in bank_stocks:
-        # 获取实时行情
-        quote = get_api_data(f"/api/quote/{symbol}")
+        q = quotes.get(symbol)
         
-        if quote.get('quote'):
-            q = quote['quote']
+        if q:
             # 计算涨跌幅: (当前价 - 昨收价) / 昨收价 * 100
             last_close = q.get('last_close', 0)
             current_price = q.get('price', 0)
@@ -78,23 +146,37 @@ def analyze_stock_performance():
             })
     
     if performance_data:
-        df = pd.DataFrame(performance_data)
-        df = df.sort_values('updown', ascending=False)
+        ranked = sorted(performance_data, key=lambda d: d['updown'], reverse=True)
         
         print("银行股表现排名:")
-        print(df[['symbol', 'name', 'price', 'updown', 'volume']].to_string(index=False))
+        print_table(ranked, ['symbol', 'name', 'price', 'updown', 'volume'])
         
         # 可视化
-        plt.figure(figsize=(10, 6))
-        plt.bar(df['name'], df['updown'], color=['green' if x >= 0 else 'red' for x in df['updown']])
-        plt.title('银行股涨跌幅对比')
-        plt.xlabel('股票名称')
-        plt.ylabel('涨跌幅 (%)')
-        plt.xticks(rotation=45)
-        plt.tight_layout()
-        plt.savefig('bank_stocks_performance.png')
+        names = [d['name'] for d in ranked]
+        updowns = [d['updown'] for d in ranked]
+        fig = Figure(figsize=(10, 6))
+        ax = fig.subplots()
+        ax.bar(names, updowns, color=['green' if x >= 0 else 'red' for x in updowns])
+        ax.set_title('银行股涨跌幅对比')
+        ax.set_xlabel('股票名称')
+        ax.set_ylabel('涨跌幅 (%)')
+        ax.tick_params(axis='x', labelrotation=45)
+        fig.tight_layout()
+        fig.savefig('bank_stocks_performance.png')
         print("图表已保存为 bank_stocks_performance.png")
 
+# K线字段及其类型，显式指定以跳过 DataFrame 的类型推断
+_BAR_DTYPES = {'open': 'float64', 'close': 'float64', 'high': 'float64',
+               'low': 'float64', 'vol': 'float64', 'amount': 'float64'}
+_BAR_COLUMNS = ['datetime'] + list(_BAR_DTYPES)
+
+def moving_average(values: np.ndarray, window: int) -> np.ndarray:
+    """简单移动平均，前 window-1 个位置以 NaN 填充（与 rolling().mean() 一致）"""
+    out = np.full(len(values), np.nan)
+    if len(values) >= window:
+        out[window - 1:] = np.convolve(values, np.ones(window) / window, mode='valid')
+    return out
+
 def analyze_historical_trend():
     """分析历史趋势"""
     print("\n=== 历史趋势分析 ===")
@@ -103,13 +185,14 @@ def analyze_historical_trend():
     history = get_api_data("/api/history/sz000001", {"period": 9, "count": 20})  # 20个交易日
     
     if history.get('data'):
-        df = pd.DataFrame(history['data'])
+        df = pd.DataFrame.from_records(history['data'], columns=_BAR_COLUMNS).astype(_BAR_DTYPES)
         df['datetime'] = pd.to_datetime(df['datetime'])
         df.set_index('datetime', inplace=True)
         
         # 计算移动平均
-        df['MA5'] = df['close'].rolling(window=5).mean()
-        df['MA20'] = df['close'].rolling(window=20).mean()
+        close = df['close'].to_numpy(dtype=float)
+        df['MA5'] = moving_average(close, 5)
+        df['MA20'] = moving_average(close, 20)
         
         print("平安银行近期走势:")
         print(f"最新收盘价: {df['close'].iloc[-1]:.2f}")
@@ -117,17 +200,18 @@ def analyze_historical_trend():
         print(f"20日均价: {df['MA20'].iloc[-1]:.2f}")
         
         # 可视化
-        plt.figure(figsize=(12, 6))
-        plt.plot(df.index, df['close'], label='收盘价', linewidth=2)
-        plt.plot(df.index, df['MA5'], label='5日均线', linestyle='--')
-        plt.plot(df.index, df['MA20'], label='20日均线', linestyle='-.')
-        plt.title('平安银行股价走势')
-        plt.xlabel('日期')
-        plt.ylabel('价格')
-        plt.legend()
-        plt.grid(True)
-        plt.tight_layout()
-        plt.savefig('stock_trend_analysis.png')
+        fig = Figure(figsize=(12, 6))
+        ax = fig.subplots()
+        ax.plot(df.index, df['close'], label='收盘价', linewidth=2)
+        ax.plot(df.index, df['MA5'], label='5日均线', linestyle='--')
+        ax.plot(df.index, df['MA20'], label='20日均线', linestyle='-.')
+        ax.set_title('平安银行股价走势')
+        ax.set_xlabel('日期')
+        ax.set_ylabel('价格')
+        ax.legend()
+        ax.grid(True)
+        fig.tight_layout()
+        fig.savefig('stock_trend_analysis.png')
         print("图表已保存为 stock_trend_analysis.png")
 
 def analyze_sector_distribution():
@@ -138,29 +222,28 @@ def analyze_sector_distribution():
     blocks = get_api_data("/api/blocks")
     
     if blocks.get('blocks'):
-        block_data = []
-        
-        for block in blocks['blocks']:
-            if block.get('stocks'):
-                block_data.append({
-                    'block_name': block.get('blockname', '未知'),
-                    'stock_count': len(block.get('stocks', [])),
-                    'block_type': block.get('blocktype', '未知')
-                })
-        
-        df = pd.DataFrame(block_data)
+        block_data = [
+            {
+                'block_name': block.get('blockname', '未知'),
+                'stock_count': len(block['stocks']),
+                'block_type': block.get('blocktype', '未知')
+            }
+            for block in blocks['blocks'] if block.get('stocks')
+        ]
         
         # 按股票数量排序
-        df = df.sort_values('stock_count', ascending=False)
+        ranked = sorted(block_data, key=lambda d: d['stock_count'], reverse=True)
         
         print("板块股票数量排名 (前10):")
-        print(df.head(10)[['block_name', 'stock_count', 'block_type']].to_string(index=False))
+        print_table(ranked[:10], ['block_name', 'stock_count', 'block_type'])
         
         # 按板块类型统计
-        type_stats = df.groupby('block_type')['stock_count'].sum().sort_values(ascending=False)
+        type_stats = Counter()
+        for d in block_data:
+            type_stats[d['block_type']] += d['stock_count']
         
         print("\n按板块类型统计:")
-        for block_type, count in type_stats.items():
+        for block_type, count in type_stats.most_common():
             print(f"  {block_type}: {count} 只股票")
 
 def analyze_volume_analysis():
@@ -172,11 +255,12 @@ def analyze_volume_analysis():
     
     volume_data = []
     
+    quotes = fetch_quotes(active_stocks)
+    
     for symbol in active_stocks:
-        quote = get_api_data(f"/api/quote/{symbol}")
+        q = quotes.get(symbol)
         
-        if quote.get('quote'):
-            q = quote['quote']
+        if q:
             volume_data.append({
                 'symbol': symbol,
                 'name': q.get('name', symbol),
@@ -186,27 +270,26 @@ def analyze_volume_analysis():
             })
     
     if volume_data:
-        df = pd.DataFrame(volume_data)
-        df = df.sort_values('volume', ascending=False)
+        ranked = sorted(volume_data, key=lambda d: d['volume'], reverse=True)
         
         print("股票成交量排名:")
-        print(df[['symbol', 'name', 'volume', 'amount']].to_string(index=False))
+        print_table(ranked, ['symbol', 'name', 'volume', 'amount'])
         
         # 计算成交额
-        total_amount = df['amount'].sum()
+        total_amount = sum(d['amount'] for d in ranked)
         print(f"\n总成交额: {total_amount:,.0f} 元")
         
         # 计算占比
-        df['amount_pct'] = (df['amount'] / total_amount) * 100
-        
         print("\n成交额占比:")
-        for _, row in df.iterrows():
-            print(f"  {row['name']}: {row['amount_pct']:.1f}%")
+        for d in ranked:
+            pct = d['amount'] / total_amount * 100 if total_amount else 0
+            print(f"  {d['name']}: {pct:.1f}%")
 
 def main():
     """主函数"""
     print("TDX数据服务数据分析示例")
     print("本示例演示如何使用API数据进行金融分析")
+    _QUOTE_MEMO.clear()
     
     try:
         analyze_stock_performance()
@@ -1,58 +1,6 @@
-import requests
 from typing import Any, Dict, TypedDict
 
-class HTTPMCPClient:
-    def __init__(self, base_url: str = "http://localhost:6999/mcp", timeout: int = 15):
-        self.base_url = base_url.rstrip("/")
-        self.timeout = timeout
-        self.session = requests.Session()
-
-    def _api_base(self) -> str:
-        if self.base_url.endswith("/mcp"):
-            return self.base_url[:-4]
-        return self.base_url
-
-    def call_tool(self, name: str, args: Dict[str, Any]) -> Any:
-        api_base = self._api_base()
-        if name == "get_quote":
-            symbol = args["symbol"]
-            r = self.session.get(f"{api_base}/api/quote/{symbol}", timeout=self.timeout)
-            return r.json()
-        if name == "get_quotes":
-            symbols = args.get("symbols", [])
-            r = self.session.post(f"{api_base}/api/quotes", json=symbols, timeout=self.timeout)
-            return r.json()
-        if name == "get_history":
-            symbol = args["symbol"]
-            period = int(args.get("period", 9))
-            count = int(args.get("count", 50))
-            r = self.session.get(f"{api_base}/api/history/{symbol}", params={"period": period, "count": count}, timeout=self.timeout)
-            return r.json()
-        if name == "get_history_batch":
-            payload = {
-                "symbols": args.get("symbols", []),
-                "period": int(args.get("period", 9)),
-                "count": int(args.get("count", 50)),
-            }
-            if "batch_size" in args:
-                payload["batch_size"] = int(args["batch_size"])
-            r = self.session.post(f"{api_base}/api/history/batch", json=payload, timeout=self.timeout)
-            return r.json()
-        if name == "get_finance":
-            symbol = args["symbol"]
-            r = self.session.get(f"{api_base}/api/finance/{symbol}", timeout=self.timeout)
-            return r.json()
-        if name == "get_stock_info":
-            symbol = args["symbol"]
-            r = self.session.get(f"{api_base}/api/stock/{symbol}", timeout=self.timeout)
-            return r.json()
-        if name == "get_blocks":
-            r = self.session.get(f"{api_base}/api/blocks", timeout=self.timeout)
-            return r.json()
-        if name == "get_industries":
-            r = self.session.get(f"{api_base}/api/industries", timeout=self.timeout)
-            return r.json()
-        raise ValueError("unknown tool")
+from _mcp_http_client import HTTPMCPClient
 
 class State(TypedDict):
     symbol: str
@@ -60,11 +8,9 @@ class State(TypedDict):
 
 client = HTTPMCPClient("http://localhost:6999/mcp")
 
-def node_get_quote(state: State) -> State:
-    q = client.call_tool("get_quote", {"symbol": state["symbol"]})
-    s = dict(state)
-    s["quote"] = q
-    return s
+def node_get_quote(state: State) -> Dict[str, Any]:
+    # 只返回变更的字段，由LangGraph合并进状态
+    return {"quote": client.call_tool("get_quote", {"symbol": state["symbol"]})}
 
 if __name__ == "__main__":
     try:
@@ -4,24 +4,18 @@ TDX数据服务快速测试脚本
 快速验证所有API端点是否正常工作
 """
 
-import requests
-import json
-import time
+import asyncio
+import httpx
 
 BASE_URL = "http://localhost:6999"
 
-def test_endpoint(endpoint, method="GET", data=None, name=None):
+async def test_endpoint(client, endpoint, method="GET", data=None, name=None):
     """测试单个端点"""
     try:
         if method == "GET":
-            response = requests.get(f"{BASE_URL}{endpoint}", timeout=10)
+            response = await client.get(endpoint)
         else:
-            response = requests.post(
-                f"{BASE_URL}{endpoint}",
-                headers={"Content-Type": "application/json"},
-                json=data,
-                timeout=10
-            )
+            response = await client.post(endpoint, json=data)
         
         success = response.status_code == 200
         status = "✅" if success else "❌"
@@ -41,60 +35,87 @@ def test_endpoint(endpoint, method="GET", data=None, name=None):
         print(f"  异常: {e}")
         return False
 
+async def run_tests():
+    """按组并发测试各端点，组间保留间隔"""
+    results = []
+    
+    # 同一个AsyncClient复用keep-alive连接池，组内请求并发执行
+    async with httpx.AsyncClient(base_url=BASE_URL, timeout=10) as client:
+        # 测试基础端点
+        results += await asyncio.gather(
+            test_endpoint(client, "/", name="服务根目录"),
+            test_endpoint(client, "/api/status", name="服务状态"),
+            test_endpoint(client, "/api/servers", name="服务器列表"),
+        )
+        
+        await asyncio.sleep(0.5)
+        
+        # 测试实时数据端点
+        results += await asyncio.gather(
+            test_endpoint(client, "/api/quote/sz000001", name="单只股票行情"),
+            test_endpoint(
+                client,
+                "/api/quotes", 
+                method="POST", 
+                data=["sh600036", "sz000002"],
+                name="批量股票行情"
+            ),
+        )
+        
+        await asyncio.sleep(0.5)
+        
+        # 测试历史数据端点
+        results += await asyncio.gather(
+            test_endpoint(
+                client,
+                "/api/history/sz000001?period=9&count=5", 
+                name="单只股票历史数据"
+            ),
+            test_endpoint(
+                client,
+                "/api/history/batch",
+                method="POST",
+                data={"symbols": ["sh600036", "sz000002"], "period": 9, "count": 3},
+                name="批量历史数据"
+            ),
+        )
+        
+        await asyncio.sleep(0.5)
+        
+        # 测试财务数据端点与新增端点
+        results += await asyncio.gather(
+            test_endpoint(client, "/api/finance/sz000001", name="财务数据"),
+            test_endpoint(client, "/api/stock/sz000001", name="股票信息"),
+            test_endpoint(client, "/api/blocks", name="板块数据"),
+            test_endpoint(client, "/api/industries", name="行业数据"),
+            test_endpoint(client, "/api/xdxr/sz000001", name="除权除息信息"),
+        )
+        
+        await asyncio.sleep(0.5)
+        
+        # 测试连接池（顺序执行，复用同一keep-alive连接）
+        results.append(await test_endpoint(client, "/api/quote/sh600000", name="连接池测试1"))
+        results.append(await test_endpoint(client, "/api/quote/sz000001", name="连接池测试2"))
+        results.append(await test_endpoint(client, "/api/quote/sh601318", name="连接池测试3"))
+        
+        # 获取连接池状态
+        pool_size = None
+        try:
+            status_response = await client.get("/api/status")
+            if status_response.status_code == 200:
+                status_data = status_response.json()
+                pool_size = status_data.get('connection_pool', {}).get('size', 0)
+        except Exception:
+            pass
+    
+    return results, pool_size
+
 def main():
     """主函数"""
     print("TDX数据服务快速测试")
     print("=" * 50)
     
-    results = []
-    
-    # 测试基础端点
-    results.append(test_endpoint("/", name="服务根目录"))
-    results.append(test_endpoint("/api/status", name="服务状态"))
-    results.append(test_endpoint("/api/servers", name="服务器列表"))
-    
-    time.sleep(0.5)
-    
-    # 测试实时数据端点
-    results.append(test_endpoint("/api/quote/sz000001", name="单只股票行情"))
-    results.append(test_endpoint(
-        "/api/quotes", 
-        method="POST", 
-        data=["sh600036", "sz000002"],
-        name="批量股票行情"
-    ))
-    
-    time.sleep(0.5)
-    
-    # 测试历史数据端点
-    results.append(test_endpoint(
-        "/api/history/sz000001?period=9&count=5", 
-        name="单只股票历史数据"
-    ))
-    results.append(test_endpoint(
-        "/api/history/batch",
-        method="POST",
-        data={"symbols": ["sh600036", "sz000002"], "period": 9, "count": 3},
-        name="批量历史数据"
-    ))
-    
-    time.sleep(0.5)
-    
-    # 测试财务数据端点
-    results.append(test_endpoint("/api/finance/sz000001", name="财务数据"))
-    results.append(test_endpoint("/api/stock/sz000001", name="股票信息"))
-    
-    # 测试新增端点
-    results.append(test_endpoint("/api/blocks", name="板块数据"))
-    results.append(test_endpoint("/api/industries", name="行业数据"))
-    results.append(test_endpoint("/api/xdxr/sz000001", name="除权除息信息"))
-    
-    time.sleep(0.5)
-    
-    # 测试连接池
-    results.append(test_endpoint("/api/quote/sh600000", name="连接池测试1"))
-    results.append(test_endpoint("/api/quote/sz000001", name="连接池测试2"))
-    results.append(test_endpoint("/api/quote/sh601318", name="连接池测试3"))
+    results, pool_size = asyncio.run(run_tests())
     
     # 汇总结果
     print("\n" + "=" * 50)
@@ -110,14 +131,8 @@ def main():
         print("\n⚠️  部分测试失败，请检查服务状态。")
     
     # 显示连接池状态
-    try:
-        status_response = requests.get(f"{BASE_URL}/api/status")
-        if status_response.status_code == 200:
-            status_data = status_response.json()
-            pool_size = status_data.get('connection_pool', {}).get('size', 0)
-            print(f"\n当前连接池大小: {pool_size} 个连接")
-    except:
-        pass
+    if pool_size is not None:
+        print(f"\n当前连接池大小: {pool_size} 个连接")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -1,22 +1,39 @@
 """TDX数据源管理服务 - FastAPI应用入口"""
 import os
+import time
+import queue
 import asyncio
-from concurrent.futures import ThreadPoolExecutor
+import logging
+from logging.handlers import QueueHandler, QueueListener
 
 from fastapi import FastAPI
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, FileResponse, ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 from fastapi import Request
+from fastapi.concurrency import run_in_threadpool
+import anyio.to_thread
 
-from config import TDX_SERVERS
+from config import TDX_SERVERS, API_CONFIG
 from app.connection.pool import tdx_connection_pool
 from app.connection.client import tdx_client
 from app.api import servers_router, quotes_router, history_router, blocks_router
 from app.mcp.tools import get_mcp_app, get_mcp_server
 from app.services.cache import CacheService
+from app.services.executor import ExecutorOverloaded
+
+# 应用日志写入队列，由后台线程输出，事件循环线程不做阻塞IO
+# 级别由环境变量 TDX_LOG_LEVEL 控制（默认 INFO，设为 DEBUG 可看到板块/行业条数等调试信息）
+_log_queue: queue.SimpleQueue = queue.SimpleQueue()
+_log_listener = QueueListener(_log_queue, logging.StreamHandler())
+log = logging.getLogger("tdxmcp")
+log.setLevel(os.getenv("TDX_LOG_LEVEL", "INFO").upper())
+log.addHandler(QueueHandler(_log_queue))
+log.propagate = False
 
 # 创建 FastAPI 应用
-app = FastAPI(title="TDX数据源管理服务", version="1.0.0")
+# 默认使用 orjson 序列化响应，板块/行业/批量K线等大响应明显更快
+app = FastAPI(title="TDX数据源管理服务", version="1.0.0", default_response_class=ORJSONResponse)
 
 # 允许跨域请求
 app.add_middleware(
@@ -26,9 +43,15 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# 其余较大的响应按需压缩；已带 Content-Encoding 的响应直接透传：板块/行业等缓存响应，
+# 以及标记为 identity 的 NDJSON 流式响应(压缩器会缓冲输出，流式行无法逐行到达)
+app.add_middleware(GZipMiddleware, minimum_size=1024)
+
+@app.exception_handler(ExecutorOverloaded)
+async def executor_overloaded_handler(request: Request, exc: ExecutorOverloaded):
+    """线程池过载时返回503，提示客户端稍后重试"""
+    return ORJSONResponse({"detail": str(exc)}, status_code=503, headers={"Retry-After": "1"})
 
-# 线程池用于执行阻塞操作
-executor = ThreadPoolExecutor(max_workers=10)
 
 # 注册API路由
 app.include_router(servers_router)
@@ -42,21 +65,46 @@ if mcp_app:
     app.mount("/mcp", mcp_app)
 
 
-@app.middleware("http")
 async def log_mcp_requests(request: Request, call_next):
-    if request.url.path.startswith("/mcp"):
-        accept = request.headers.get("accept")
-        content_type = request.headers.get("content-type")
-        print(f"[MCP] 请求: {request.method} {request.url.path} accept={accept} content-type={content_type}")
+    if not request.url.path.startswith("/mcp"):
+        return await call_next(request)
+    accept = request.headers.get("accept")
+    content_type = request.headers.get("content-type")
+    log.debug("[MCP] 请求: %s %s accept=%s content-type=%s", request.method, request.url.path, accept, content_type)
     response = await call_next(request)
-    if request.url.path.startswith("/mcp"):
-        print(f"[MCP] 响应: {request.method} {request.url.path} status={response.status_code}")
+    log.debug("[MCP] 响应: %s %s status=%s", request.method, request.url.path, response.status_code)
     return response
 
 
+# MCP请求跟踪日志仅在设置 MCP_TRACE 时启用，默认不注册中间件；输出级别为 DEBUG，需同时设置 TDX_LOG_LEVEL=DEBUG
+if os.getenv("MCP_TRACE", "").lower() not in ("", "0", "false", "no"):
+    app.middleware("http")(log_mcp_requests)
+
+
+# 缓存文件名 -> 刷新锁，同一缓存同时只重建一次
+_refresh_locks: dict = {}
+CACHE_TTL = 86400
+
+
+async def _refresh_if_stale(cache_dir: str, name: str, builder, ttl: int = CACHE_TTL):
+    """缓存文件缺失或超过 ttl 秒时，在线程池中调用 builder 重建"""
+    lock = _refresh_locks.setdefault(name, asyncio.Lock())
+    async with lock:
+        path = os.path.join(cache_dir, name)
+        try:
+            if time.time() - os.path.getmtime(path) < ttl:
+                return None
+        except OSError:
+            pass
+        # 在FastAPI共用的线程池(anyio限流)中执行
+        return await run_in_threadpool(builder)
+
+
 @app.on_event("startup")
 async def preload_caches():
     """启动时预加载缓存"""
+    _log_listener.start()
+    anyio.to_thread.current_default_thread_limiter().total_tokens = API_CONFIG["threadpool_tokens"]
     try:
         if mcp_app:
             mcp_server = get_mcp_server()
@@ -77,14 +125,15 @@ async def preload_caches():
             except Exception:
                 pass
         
-        # 预加载板块和行业数据
-        blocks_path = os.path.join(cache_dir, "blocks.json")
-        industries_path = os.path.join(cache_dir, "industries.json")
-        
-        if not os.path.exists(blocks_path):
-            asyncio.get_event_loop().run_in_executor(executor, tdx_client.get_stock_blocks)
-        if not os.path.exists(industries_path):
-            asyncio.get_event_loop().run_in_executor(executor, tdx_client.get_industry_info)
+        # 预加载板块和行业数据：缓存缺失或过期时才重建，并等待完成后再开始服务
+        results = await asyncio.gather(
+            _refresh_if_stale(cache_dir, "blocks.json", tdx_client.get_stock_blocks),
+            _refresh_if_stale(cache_dir, "industries.json", tdx_client.get_industry_info),
+            return_exceptions=True
+        )
+        for r in results:
+            if isinstance(r, Exception):
+                print(f"预加载缓存失败: {r}")
     except Exception:
         pass
 
@@ -94,6 +143,9 @@ async def shutdown_mcp():
     cm = getattr(app.state, "mcp_session_manager_cm", None)
     if cm:
         await cm.__aexit__(None, None, None)
+    # 健康检查线程最长可能阻塞在一次建连上，放到线程中等待
+    await run_in_threadpool(tdx_connection_pool.shutdown)
+    _log_listener.stop()
 
 
 @app.get("/")
@@ -102,15 +154,15 @@ async def root():
     return {"message": "TDX数据源管理服务", "version": "1.0.0"}
 
 
+CONFIG_HTML_PATH = os.path.join(os.path.dirname(__file__), "app", "static", "config.html")
+
+
 @app.get("/config", response_class=HTMLResponse)
 async def config_page():
     """配置页面"""
-    html_path = os.path.join(os.path.dirname(__file__), "app", "static", "config.html")
-    try:
-        with open(html_path, "r", encoding="utf-8") as f:
-            return f.read()
-    except Exception:
-        return "<h1>配置页面加载失败</h1>"
+    if os.path.isfile(CONFIG_HTML_PATH):
+        return FileResponse(CONFIG_HTML_PATH, media_type="text/html")
+    return HTMLResponse("<h1>配置页面加载失败</h1>")
 
 
 if __name__ == "__main__":
@@ -5,34 +5,66 @@
 
 from pytdx.hq import TdxHq_API
 import pandas as pd
+import datetime
 import os
 import shutil
 import tempfile
 import random
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from itertools import islice
 from urllib.request import urlopen
+from zipfile import ZipFile
 import sys
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
 from config import TDX_SERVERS
+from app.connection.symbols import a_share_mask
+
+# 代码列使用 pandas 字符串类型，装有 pyarrow 时由 Arrow 存储
+try:
+    import pyarrow  # noqa: F401
+    _CODE_DTYPE = "string[pyarrow]"
+except ImportError:
+    _CODE_DTYPE = "string"
 
 def _parse_block_name_info(incon_content: str):
-    incon_content = incon_content.splitlines()
-    incon_dict = []
+    # 按列收集后一次构造DataFrame，比逐行生成字典再由 DataFrame 推断列快一倍。
+    # 分节判断保留逐行分支：np.char.startswith 等函数内部仍逐元素调用 str 方法，
+    # 加上构造定长数组的开销，实测比这里的循环慢约10倍
+    hycodes = []
+    blocknames = []
+    types = []
     section = "Unknown"
-    for i in incon_content:
+    for i in incon_content.splitlines():
         if len(i) <= 0:
             continue
-        if i[0] == '#' and i[1] != '#':
+        # 用切片取第二个字符，单字符行不会越界
+        if i[0] == '#' and i[1:2] != '#':
             section = i[1:].strip("\n ")
-        elif i[1] != '#':
+        elif i[1:2] != '#':
             item = i.strip('\n ').split('|')
-            incon_dict.append({
-                'hycode': item[0],
-                'blockname': item[-1],
-                'type': section
-            })
-    return pd.DataFrame(incon_dict)
-
-def _download_tdx_file(withZHB: bool = True):
+            hycodes.append(item[0])
+            blocknames.append(item[-1])
+            types.append(section)
+    return pd.DataFrame({'hycode': hycodes, 'blockname': blocknames, 'type': types})
+
+def _tdx_cache_dir():
+    return os.path.join(tempfile.gettempdir(), "tdx_cache", datetime.date.today().isoformat())
+
+def _cached_tdx_dir(withZHB: bool):
+    """当天已下载并解压过的目录，没有则返回 None"""
+    cache_dir = _tdx_cache_dir()
+    needed = ["tdxhy.cfg"] + (["incon.dat"] if withZHB else [])
+    if all(os.path.exists(os.path.join(cache_dir, n)) for n in needed):
+        return cache_dir
+    return None
+
+def _download_tdx_file(withZHB: bool = True, use_cache: bool = True):
+    """下载并解压通达信文件；use_cache 时按日期缓存在临时目录的 tdx_cache 下，当天重复运行不再下载"""
+    if use_cache:
+        cached = _cached_tdx_dir(withZHB)
+        if cached:
+            return cached
     urls = [
         'http://www.tdx.com.cn/products/data/data/dbf/base.zip',
         'http://www.tdx.com.cn/products/data/data/dbf/gbbq.zip',
@@ -42,95 +74,131 @@ def _download_tdx_file(withZHB: bool = True):
     tmpdir = os.path.join(tmpdir_root, subdir_name)
     shutil.rmtree(tmpdir, ignore_errors=True)
     os.makedirs(tmpdir)
+
+    def fetch(url):
+        with urlopen(url, timeout=30) as f:
+            return f.read()
+
     try:
-        for url in urls if withZHB else urls[:-1]:
-            file = tmpdir + '/' + 'tmp.zip'
-            f = urlopen(url)
-            data = f.read()
-            with open(file, 'wb') as code:
-                code.write(data)
-            f.close()
-            shutil.unpack_archive(file, extract_dir=tmpdir)
-            zhb = os.path.join(tmpdir, "zhb.zip")
-            if os.path.exists(zhb):
-                shutil.unpack_archive(zhb, extract_dir=tmpdir)
-            os.remove(file)
+        targets = urls if withZHB else urls[:-1]
+        # 两个文件并行下载，解压仍按顺序进行
+        with ThreadPoolExecutor(max_workers=len(targets)) as pool:
+            blobs = list(pool.map(fetch, targets))
+        for data in blobs:
+            # 下载内容已在内存中，直接解压，不先写临时 zip 再读回；嵌套的 zhb.zip 同样在内存中展开
+            with ZipFile(BytesIO(data)) as z:
+                names = z.namelist()
+                z.extractall(tmpdir, members=[n for n in names if n != "zhb.zip"])
+                if "zhb.zip" in names:
+                    with ZipFile(BytesIO(z.read("zhb.zip"))) as zhb:
+                        zhb.extractall(tmpdir)
     except Exception:
         pass
+    if use_cache and os.path.exists(os.path.join(tmpdir, "tdxhy.cfg")):
+        # 解压完整后再整体移入缓存目录，中断的下载不会留下残缺的缓存
+        cache_dir = _tdx_cache_dir()
+        os.makedirs(os.path.dirname(cache_dir), exist_ok=True)
+        shutil.rmtree(cache_dir, ignore_errors=True)
+        try:
+            os.replace(tmpdir, cache_dir)
+            return cache_dir
+        except OSError:
+            pass
     return tmpdir
 
 def _read_industry(folder: str):
     fhy = folder + '/tdxhy.cfg'
     try:
+        # 逐行按 | 切分：tdxhy.cfg 各行字段数不一，read_csv 遇到多出的字段会报错，
+        # 由列表构造 DataFrame 时较短的行自动补 None
         with open(fhy, encoding='GB18030', mode='r') as f:
-            hy = f.readlines()
-        hy = [line.replace('\n', '') for line in hy]
-        hy = pd.DataFrame(line.split('|') for line in hy)
-        hy = hy[~hy[1].str.startswith('9')]
-        hy = hy[~hy[1].str.startswith('2')]
+            hy = pd.DataFrame(line.split('|') for line in f.read().splitlines())
+        # 9/2 开头的代码一次过滤，只遍历一遍代码列
+        hy = hy[~hy[1].str.startswith(('9', '2'), na=False)]
+        # melt 默认生成新的整数索引，不需要先 reset_index
         df = hy.rename({0: 'sse', 1: 'code', 2: 'tdx_code', 3: 'sw_code', 5: 'tdxrshy_code'}, axis=1). \
-            reset_index(drop=True). \
             melt(id_vars=('sse', 'code'), value_name='hycode')
-        return df
+        # 长表中 sse/hycode 大量重复，转为 category 降低内存，合并与分组按整数编码进行
+        return df.astype({'sse': 'category', 'hycode': 'category'})
     except Exception:
         return pd.DataFrame()
 
-def test_pytdx_blocks():
-    print("=== 测试板块数据（pytdx） ===")
-    api = TdxHq_API()
+_BLOCK_FILES = [
+    ("block.dat", "yb"),
+    ("block_fg.dat", "fg"),
+    ("block_gn.dat", "gn"),
+    ("block_zs.dat", "zs"),
+    ("hkblock.dat", "hk"),
+    ("jjblock.dat", "jj"),
+]
+
+def _fetch_block_files(files, connections: int = 3):
+    """
+    建立多个 pytdx 连接并行下载板块文件，返回按 files 顺序排列的 DataFrame 列表(失败的文件跳过)
+
+    文件按轮询分给各连接，每个连接在自己的线程中依次下载分到的文件，同一连接不会被并发使用
+    """
     s = TDX_SERVERS[0]
-    with api.connect(s["ip"], s["port"]):
-        files = [
-            ("block.dat", "yb"),
-            ("block_fg.dat", "fg"),
-            ("block_gn.dat", "gn"),
-            ("block_zs.dat", "zs"),
-            ("hkblock.dat", "hk"),
-            ("jjblock.dat", "jj"),
-        ]
-        dfs = []
-        for fn, tp in files:
+    groups = [list(range(k, len(files), connections)) for k in range(min(connections, len(files)))]
+    frames = [None] * len(files)
+
+    def worker(indexes):
+        api = TdxHq_API()
+        try:
+            if not api.connect(s["ip"], s["port"]):
+                return
+            for idx in indexes:
+                fn, tp = files[idx]
+                try:
+                    frames[idx] = api.to_df(api.get_and_parse_block_info(fn)).assign(blocktype=tp)
+                except Exception:
+                    pass
+        finally:
             try:
-                df = api.to_df(api.get_and_parse_block_info(fn)).assign(blocktype=tp)
-                dfs.append(df)
+                api.disconnect()
             except Exception:
                 pass
-        if not dfs:
-            print("未获取到板块数据")
-            return
-        data = pd.concat(dfs, sort=False)
-        print(f"原始记录数: {len(data)}")
-        print(f"列: {list(data.columns)}")
-
-        # 去重与过滤，仅统计A股常见代码段
-        try:
-            data["code"] = data["code"].astype(str)
-        except Exception:
-            pass
 
-        def is_a_share(code: str) -> bool:
-            return (
-                code.startswith("000") or code.startswith("001") or code.startswith("002") or
-                code.startswith("003") or code.startswith("200") or code.startswith("300") or
-                code.startswith("301") or code.startswith("600") or code.startswith("601") or
-                code.startswith("603") or code.startswith("605") or code.startswith("688")
-            ) and len(code) == 6
+    with ThreadPoolExecutor(max_workers=len(groups)) as pool:
+        list(pool.map(worker, groups))
+    return [df for df in frames if df is not None]
 
-        filt = data[data["code"].apply(is_a_share)]
-        filt = filt.drop_duplicates(subset=["blockname", "code", "blocktype"], keep="first")
+def test_pytdx_blocks():
+    print("=== 测试板块数据（pytdx） ===")
+    dfs = _fetch_block_files(_BLOCK_FILES)
+    if not dfs:
+        print("未获取到板块数据")
+        return
+    data = pd.concat(dfs, copy=False, ignore_index=True)
+    print(f"原始记录数: {len(data)}")
+    print(f"列: {list(data.columns)}")
 
-        gsize = filt.groupby(["blockname", "blocktype"]).size().sort_values(ascending=False)
-        print(f"板块数量: {len(gsize)}")
-        for (name, bt), cnt in gsize.head(10).items():
-            try:
-                codes = filt[(filt['blockname'] == name) & (filt['blocktype'] == bt)]["code"].head(5).tolist()
-            except Exception:
-                codes = []
-            print(f"  - {name}: {cnt} 只股票 ({bt})")
-            if codes:
-                print(f"    示例股票: {', '.join(codes)}")
+    # 去重与过滤，仅统计A股常见代码段
+    data["code"] = data["code"].astype(_CODE_DTYPE)
+
+    # 与服务端共用同一个A股代码段过滤
+    mask = a_share_mask(data["code"])
+    filt = data[mask]
+    filt = filt.drop_duplicates(subset=["blockname", "code", "blocktype"], keep="first")
+    # 板块名/类型基数很低，转为 category 后分组直接使用整数编码，不再逐个哈希字符串
+    filt = filt.astype({"blockname": "category", "blocktype": "category"})
+
+    # value_counts 一次完成分组计数并按数量降序排列
+    gsize = filt.value_counts(subset=["blockname", "blocktype"])
+    print(f"板块数量: {len(gsize)}")
+    # groupby.head 向量化取出每个板块的前5行，不再对每组调用 lambda；
+    # 剩余行数很少，逐行收集成字典后按 (板块名, 类型) 直接查找
+    heads = filt.groupby(["blockname", "blocktype"], sort=False, observed=True).head(5)
+    samples = {}
+    for name, bt, code in zip(heads["blockname"], heads["blocktype"], heads["code"]):
+        samples.setdefault((name, bt), []).append(code)
+    for (name, bt), cnt in gsize.head(10).items():
+        codes = samples.get((name, bt), [])
+        print(f"  - {name}: {cnt} 只股票 ({bt})")
+        if codes:
+            print(f"    示例股票: {', '.join(codes)}")
 
-def test_pytdx_industries():
+def test_pytdx_industries(use_cache: bool = True):
     print("=== 测试行业数据（pytdx） ===")
     api = TdxHq_API()
     s = TDX_SERVERS[0]
@@ -143,7 +211,7 @@ def test_pytdx_industries():
                 incon_block_info = _parse_block_name_info(text)
         except Exception:
             pass
-        folder = _download_tdx_file(False if isinstance(incon_block_info, pd.DataFrame) else True)
+        folder = _download_tdx_file(False if isinstance(incon_block_info, pd.DataFrame) else True, use_cache)
         try:
             if not isinstance(incon_block_info, pd.DataFrame):
                 incon_path = os.path.join(folder, "incon.dat")
@@ -154,11 +222,17 @@ def test_pytdx_industries():
                 with open(incon_path, encoding='GB18030', mode='r') as f:
                     incon_content = f.read()
                 incon_block_info = _parse_block_name_info(incon_content)
-            df = _read_industry(folder).merge(incon_block_info, on='hycode')
+            industry = _read_industry(folder)
+            # 两侧 hycode 使用同一组类别，merge 才会直接按类别编码连接
+            hy_dtype = pd.CategoricalDtype(
+                industry['hycode'].cat.categories.union(incon_block_info['hycode'].unique()))
+            df = industry.astype({'hycode': hy_dtype}).merge(
+                incon_block_info.astype({'hycode': hy_dtype}), on='hycode')
             df.set_index('code', drop=False, inplace=True)
-            g = df.groupby('hycode')
+            g = df.groupby('hycode', observed=True)
             print(f"行业数量: {len(g)}")
-            for hycode, group in list(g)[:10]:
+            # groupby 迭代是惰性的，islice 只取出前10组，不把全部行业都切成子表
+            for hycode, group in islice(g, 10):
                 name = group['blockname'].iloc[0]
                 codes = group['code'].astype(str).head(5).tolist()
                 print(f"  - {name}: {len(group)} 只股票 ({hycode})")
@@ -167,8 +241,10 @@ def test_pytdx_industries():
         except Exception as e:
             print(f"获取行业数据失败: {e}")
         finally:
-            shutil.rmtree(folder, ignore_errors=True)
+            # 缓存目录保留给下次运行
+            if not use_cache:
+                shutil.rmtree(folder, ignore_errors=True)
 
 if __name__ == "__main__":
     test_pytdx_blocks()
-    test_pytdx_industries()
\ No newline at end of file
+    test_pytdx_industries(use_cache="--no-cache" not in sys.argv)
\ No newline at end of file
@@ -4,18 +4,91 @@ TDX数据服务API测试脚本
 测试所有API端点的功能完整性
 """
 
+import io
+import os
+import sys
+import threading
 import requests
-import json
+from requests.adapters import HTTPAdapter
 import time
-from typing import Dict, Any
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List
+
+import numpy as np
+from pydantic import BaseModel, Field, TypeAdapter, ValidationError
+
+# 与示例共用的 JSON 编解码
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "examples"))
+from _fastjson import json_dumps as _json_dumps
 
 BASE_URL = "http://localhost:6999"
 
+# 所有测试共用一个会话，keep-alive 复用连接，计时不再包含每次建连的开销
+_SESSION = requests.Session()
+_SESSION.headers["Content-Type"] = "application/json"
+# 测试并行执行时各线程共用连接池，池大小不小于并行数，避免连接用完后再新建
+_SESSION.mount("http://", HTTPAdapter(pool_connections=16, pool_maxsize=16))
+
+
+# 响应数据结构，类定义时 pydantic 即编译好校验器，逐条校验不再手写字段/类型判断
+class _Quote(BaseModel):
+    market: int
+    code: str
+    price: float = Field(ge=0)
+    last_close: float = Field(ge=0)
+    vol: float = Field(ge=0)
+    amount: float = Field(ge=0)
+
+
+class _Bar(BaseModel):
+    open: float
+    close: float
+    high: float
+    low: float
+    vol: float = Field(ge=0)
+    amount: float = Field(ge=0)
+    datetime: str
+
+
+# 财务信息中必须存在的字段，用集合差一次求出缺失项
+_FINANCE_FIELDS = frozenset({
+    "market", "code", "liutongguben", "zongguben", "zongzichan",
+    "jingzichan", "zhuyingshouru", "jinglirun", "meigujingzichan",
+})
+
+_QUOTES = TypeAdapter(List[_Quote])
+_BARS = TypeAdapter(List[_Bar])
+
+
+def _schema_issues(adapter: TypeAdapter, records) -> List[str]:
+    """按结构校验记录列表，返回问题描述(最多5条)"""
+    try:
+        adapter.validate_python(records)
+        return []
+    except ValidationError as e:
+        return [f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors()[:5]]
+
+
+_OHLC_FIELDS = ("open", "high", "low", "close", "vol", "amount")
+
+
+def _ohlc_issues(bars) -> List[str]:
+    """K线价格逻辑检查：整列转为数组后一次比较，返回问题描述(最多10条)"""
+    if not bars:
+        return []
+    try:
+        arr = np.array([[b[f] for f in _OHLC_FIELDS] for b in bars], dtype=np.float64)
+    except (KeyError, TypeError, ValueError) as e:
+        return [f"K线字段缺失或类型错误: {e}"]
+    o, h, l, c, v, a = arr.T
+    bad = (h < l) | (h < o) | (h < c) | (l > o) | (l > c) | (v < 0) | (a < 0)
+    return [f"第{i}条K线价格逻辑错误" for i in np.flatnonzero(bad)[:10]]
+
 def test_connection():
     """测试服务连接"""
     print("=== 测试服务连接 ===")
     try:
-        response = requests.get(f"{BASE_URL}/")
+        response = _SESSION.get(f"{BASE_URL}/")
         print(f"状态码: {response.status_code}")
         print(f"响应: {response.json()}")
         return response.status_code == 200
@@ -27,7 +100,7 @@ def test_server_status():
     """测试服务器状态"""
     print("\n=== 测试服务器状态 ===")
     try:
-        response = requests.get(f"{BASE_URL}/api/status")
+        response = _SESSION.get(f"{BASE_URL}/api/status")
         data = response.json()
         print(f"连接状态: {data['connected']}")
         print(f"当前服务器: {data['current_server']}")
@@ -40,7 +113,7 @@ def test_servers_list():
     """测试服务器列表"""
     print("\n=== 测试服务器列表 ===")
     try:
-        response = requests.get(f"{BASE_URL}/api/servers")
+        response = _SESSION.get(f"{BASE_URL}/api/servers")
         data = response.json()
         print(f"可用服务器数量: {len(data['servers'])}")
         for server in data['servers']:
@@ -57,9 +130,9 @@ def test_real_time_quote():
     
     for symbol in test_symbols:
         try:
-            response = requests.get(f"{BASE_URL}/api/quote/{symbol}")
-            data = response.json()
-            print(f"{symbol} 行情: {data['quote']['price'] if 'quote' in data else '无数据'}")
+            response = _SESSION.get(f"{BASE_URL}/api/quote/{symbol}")
+            quote = response.json().get('quote')
+            print(f"{symbol} 行情: {quote['price'] if quote else '无数据'}")
         except Exception as e:
             print(f"{symbol} 行情测试失败: {e}")
             return False
@@ -72,10 +145,9 @@ def test_batch_quotes():
     symbols = ["sh600036", "sz000002", "sh601318"]  # 招商银行, 万科A, 中国平安
     
     try:
-        response = requests.post(
+        response = _SESSION.post(
             f"{BASE_URL}/api/quotes",
-            headers={"Content-Type": "application/json"},
-            data=json.dumps(symbols)
+            data=_json_dumps(symbols)
         )
         data = response.json()
         print(f"批量查询结果: {len(data['quotes'])} 条数据")
@@ -93,7 +165,7 @@ def test_history_data():
     symbol = "sz000001"  # 平安银行
     
     try:
-        response = requests.get(f"{BASE_URL}/api/history/{symbol}?period=9&count=10")
+        response = _SESSION.get(f"{BASE_URL}/api/history/{symbol}?period=9&count=10")
         data = response.json()
         print(f"历史数据条数: {len(data['data'])}")
         if data['data']:
@@ -109,10 +181,10 @@ def test_finance_data():
     symbol = "sh600000"  # 浦发银行
     
     try:
-        response = requests.get(f"{BASE_URL}/api/finance/{symbol}")
-        data = response.json()
-        print(f"财务信息字段数: {len(data['finance_info'])}")
-        print(f"财务数据示例: {list(data['finance_info'].items())[:5]}")  # 显示前5个字段
+        response = _SESSION.get(f"{BASE_URL}/api/finance/{symbol}")
+        info = response.json()['finance_info']
+        print(f"财务信息字段数: {len(info)}")
+        print(f"财务数据示例: {list(info.items())[:5]}")  # 显示前5个字段
         return response.status_code == 200
     except Exception as e:
         print(f"财务数据测试失败: {e}")
@@ -124,7 +196,7 @@ def test_company_report():
     symbol = "sz000001"  # 平安银行
     
     try:
-        response = requests.get(f"{BASE_URL}/api/report/{symbol}?report_type=0")
+        response = _SESSION.get(f"{BASE_URL}/api/report/{symbol}?report_type=0")
         data = response.json()
         print(f"报告数据大小: {data['data_size']} 字节")
         print(f"是否有数据: {data['has_data']}")
@@ -139,7 +211,7 @@ def test_stock_info():
     symbol = "sh601988"  # 中国银行
     
     try:
-        response = requests.get(f"{BASE_URL}/api/stock/{symbol}")
+        response = _SESSION.get(f"{BASE_URL}/api/stock/{symbol}")
         data = response.json()
         print(f"股票信息: {data['info']}")
         return response.status_code == 200
@@ -153,9 +225,8 @@ def test_batch_history_data():
     symbols = ["sh600036", "sz000002", "sh601318"]  # 招商银行, 万科A, 中国平安
     
     try:
-        response = requests.post(
+        response = _SESSION.post(
             f"{BASE_URL}/api/history/batch",
-            headers={"Content-Type": "application/json"},
             json={
                 "symbols": symbols,
                 "period": 9,  # 日线
@@ -171,12 +242,64 @@ def test_batch_history_data():
         print(f"批量历史数据测试失败: {e}")
         return False
 
+def test_quote_schema():
+    """校验行情与K线的数据结构(字段齐全、类型正确、价格与成交量非负)，与各功能测试分开判定"""
+    print("\n=== 校验行情与K线数据结构 ===")
+    try:
+        response = _SESSION.post(f"{BASE_URL}/api/quotes", data=_json_dumps(["sh600000", "sz000001"]))
+        issues = _schema_issues(_QUOTES, response.json()['quotes'])
+        response = _SESSION.get(f"{BASE_URL}/api/history/sz000001?period=9&count=10")
+        issues += _schema_issues(_BARS, response.json()['data'])
+        if issues:
+            print(f"数据结构异常: {issues}")
+        else:
+            print("数据结构正常")
+        return not issues
+    except Exception as e:
+        print(f"数据结构校验失败: {e}")
+        return False
+
+def test_kline_ohlc():
+    """校验K线的高低开收关系，与历史数据测试分开判定"""
+    print("\n=== 校验K线高低开收 ===")
+    try:
+        response = _SESSION.post(
+            f"{BASE_URL}/api/history/batch",
+            json={"symbols": ["sz000001", "sh600036", "sz000002"], "period": 9, "count": 10}
+        )
+        issues = []
+        for symbol, klines in response.json()['data'].items():
+            issues.extend(f"{symbol} {issue}" for issue in _ohlc_issues(klines))
+        if issues:
+            print(f"K线数据异常: {issues}")
+        else:
+            print("K线高低开收正常")
+        return not issues
+    except Exception as e:
+        print(f"K线校验失败: {e}")
+        return False
+
+def test_finance_fields():
+    """校验财务数据包含必需字段，与财务数据测试分开判定"""
+    print("\n=== 校验财务数据字段 ===")
+    try:
+        response = _SESSION.get(f"{BASE_URL}/api/finance/sh600000")
+        missing = _FINANCE_FIELDS.difference(response.json()['finance_info'])
+        if missing:
+            print(f"缺少必需字段: {sorted(missing)}")
+        else:
+            print("财务数据字段齐全")
+        return not missing
+    except Exception as e:
+        print(f"财务字段校验失败: {e}")
+        return False
+
 def test_stock_blocks():
     """测试板块数据"""
     print("\n=== 测试板块数据 ===")
     
     try:
-        response = requests.get(f"{BASE_URL}/api/blocks")
+        response = _SESSION.get(f"{BASE_URL}/api/blocks")
         data = response.json()
         print(f"板块数据: {len(data['blocks'])} 个板块")
         if data['blocks']:
@@ -193,7 +316,7 @@ def test_industry_info():
     print("\n=== 测试行业数据 ===")
     
     try:
-        response = requests.get(f"{BASE_URL}/api/industries")
+        response = _SESSION.get(f"{BASE_URL}/api/industries")
         data = response.json()
         print(f"行业数据: {len(data['industries'])} 个行业")
         if data['industries']:
@@ -211,7 +334,7 @@ def test_xdxr_info():
     symbol = "sz000001"  # 平安银行
     
     try:
-        response = requests.get(f"{BASE_URL}/api/xdxr/{symbol}")
+        response = _SESSION.get(f"{BASE_URL}/api/xdxr/{symbol}")
         data = response.json()
         print(f"除权除息信息: {len(data['xdxr_info'])} 条记录")
         if data['xdxr_info']:
@@ -228,21 +351,23 @@ def test_connection_pool():
     print("\n=== 测试连接池功能 ===")
     
     try:
-        # 测试并发请求以验证连接池
+        # 一次批量请求取回全部代码的行情，服务端只占用一次上游调用
         symbols = ["sh600000", "sz000001", "sh601398", "sz000002", "sh601318"]
         
+        start = time.perf_counter()
+        response = _SESSION.post(f"{BASE_URL}/api/quotes", data=_json_dumps(symbols), timeout=10)
+        elapsed = (time.perf_counter() - start) * 1000
+        returned = {q.get('code') for q in response.json().get('quotes', []) if q}
+        
         results = []
         for symbol in symbols:
-            response = requests.get(f"{BASE_URL}/api/quote/{symbol}", timeout=10)
-            if response.status_code == 200:
-                results.append(True)
-                print(f"  {symbol}: 请求成功")
-            else:
-                results.append(False)
-                print(f"  {symbol}: 请求失败")
+            ok = response.status_code == 200 and symbol[-6:] in returned
+            results.append(ok)
+            print(f"  {symbol}: {'请求成功' if ok else '请求失败'}")
+        print(f"批量请求耗时: {elapsed:.1f}ms")
         
         # 检查连接池状态
-        status_response = requests.get(f"{BASE_URL}/api/status")
+        status_response = _SESSION.get(f"{BASE_URL}/api/status")
         status_data = status_response.json()
         print(f"连接池状态: {status_data.get('connection_pool', {}).get('size', 0)} 个连接")
         
@@ -251,8 +376,67 @@ def test_connection_pool():
         print(f"连接池测试失败: {e}")
         return False
 
-def run_all_tests():
-    """运行所有测试"""
+class _ThreadOutput(io.TextIOBase):
+    """按线程缓存 print 输出：并行执行的测试各自写入自己的缓冲区，结束后按测试顺序整体输出"""
+
+    def __init__(self, target):
+        self.target = target
+        self._local = threading.local()
+
+    def write(self, text):
+        buf = getattr(self._local, "buf", None)
+        return (buf if buf is not None else self.target).write(text)
+
+    def run(self, test):
+        """执行单个测试，返回 (结果, 输出)"""
+        self._local.buf = io.StringIO()
+        try:
+            return _run_test(test), self._local.buf.getvalue()
+        finally:
+            self._local.buf = None
+
+def _run_test(test) -> bool:
+    try:
+        return test()
+    except Exception as e:
+        print(f"测试执行异常: {e}")
+        return False
+
+def _run_parallel(tests, workers: int):
+    """并行执行各测试(共用同一个 Session)，按测试顺序输出并返回结果"""
+    out = _ThreadOutput(sys.stdout)
+    sys.stdout = out
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            outcomes = list(pool.map(out.run, tests))
+    finally:
+        sys.stdout = out.target
+    for _, text in outcomes:
+        sys.stdout.write(text)
+    return [result for result, _ in outcomes]
+
+def _run_sequential(tests, max_rps: float):
+    """按顺序执行各测试"""
+    results = []
+    # 按单调时钟限速：只在确实早于允许时间时才等待，快速的测试不再固定空等
+    next_allowed = time.monotonic()
+    for test in tests:
+        if max_rps > 0:
+            now = time.monotonic()
+            if now < next_allowed:
+                time.sleep(next_allowed - now)
+            next_allowed = max(now, next_allowed) + 1.0 / max_rps
+        results.append(_run_test(test))
+    return results
+
+def run_all_tests(max_rps: float = 0, workers: int = 8):
+    """
+    运行所有测试
+
+    Args:
+        max_rps: 每秒最多开始的测试数，0 表示不限速；限速时按顺序逐个执行
+        workers: 不限速时并行执行的测试数，各测试都在等待网络往返，总耗时接近最慢的一个
+    """
     print("开始运行TDX数据服务API测试...")
     print("=" * 50)
     
@@ -270,18 +454,18 @@ def run_all_tests():
         test_stock_blocks,
         test_industry_info,
         test_xdxr_info,
+        test_quote_schema,
+        test_kline_ohlc,
+        test_finance_fields,
         test_connection_pool
     ]
     
-    results = []
-    for test in tests:
-        try:
-            result = test()
-            results.append(result)
-            time.sleep(1)  # 避免请求过于频繁
-        except Exception as e:
-            print(f"测试执行异常: {e}")
-            results.append(False)
+    if max_rps > 0 or workers <= 1:
+        results = _run_sequential(tests, max_rps)
+    else:
+        # 先单独检查服务连接，中间的测试并行执行；连接池测试最后单独执行，
+        # 读取的连接池状态不受其他测试的在途请求影响
+        results = [_run_test(tests[0])] + _run_parallel(tests[1:-1], workers) + [_run_test(tests[-1])]
     
     print("\n" + "=" * 50)
     print("测试结果汇总:")
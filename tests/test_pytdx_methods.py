@@ -10,9 +10,15 @@ from config import TDX_SERVERS
 
 def parse_symbol(s: str):
     s = s.lower()
-    m = 1 if s.startswith("sh") else 0
-    c = s.replace("sh", "").replace("sz", "")
-    return m, c
+    prefix = s[:2]
+    if prefix in ("sh", "sz"):
+        return (1 if prefix == "sh" else 0), s[2:]
+    return (1 if s[:1] in ("6", "9", "5") else 0), s
+
+# 测试用到的标的在模块加载时解析一次，各测试段直接复用 (market, code)
+SZ000001 = parse_symbol("sz000001")
+SH600000 = parse_symbol("sh600000")
+QUOTES_REQ = [SZ000001, SH600000]
 
 api = TdxHq_API()
 server = TDX_SERVERS[0]
@@ -20,18 +26,16 @@ connected = api.connect(server["ip"], server["port"])
 
 print("=== 测试实时行情(单/多标的) ===")
 try:
-    m1, c1 = parse_symbol("sz000001")
-    data_single = api.get_security_quotes([(m1, c1)])
+    data_single = api.get_security_quotes([SZ000001])
     print(data_single[0] if data_single else {})
-    req = [parse_symbol(s) for s in ["sz000001", "sh600000"]]
-    data_multi = api.get_security_quotes(req)
+    data_multi = api.get_security_quotes(QUOTES_REQ)
     print(len(data_multi) if data_multi else 0)
 except Exception as e:
     print(f"实时行情测试失败: {e}")
 
 print("\n=== 测试历史K线(日/周/月) ===")
 try:
-    m, c = parse_symbol("sz000001")
+    m, c = SZ000001
     day = api.get_security_bars(4, m, c, 0, 5)
     print(len(day) if day else 0)
     week = api.get_security_bars(5, m, c, 0, 5)
@@ -43,7 +47,7 @@ except Exception as e:
 
 print("\n=== 测试分钟线(5分钟) ===")
 try:
-    m, c = parse_symbol("sz000001")
+    m, c = SZ000001
     mins = api.get_security_bars(0, m, c, 0, 5)
     print(len(mins) if mins else 0)
 except Exception as e:
@@ -51,7 +55,7 @@ except Exception as e:
 
 print("\n=== 测试财务数据 ===")
 try:
-    m, c = parse_symbol("sh600000")
+    m, c = SH600000
     fin = api.get_finance_info(m, c)
     print(len(fin) if isinstance(fin, dict) else 0)
 except Exception as e:
@@ -59,7 +63,7 @@ except Exception as e:
 
 print("\n=== 测试除权除息 ===")
 try:
-    m, c = parse_symbol("sz000001")
+    m, c = SZ000001
     xdxr = api.get_xdxr_info(m, c)
     print(len(xdxr) if xdxr else 0)
 except Exception as e: